@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import OutgoingEmail
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "pk",
+        "status",
+        "created",
+        "attempts",
+        "sent_at",
+        "latency_ms",
+    )
+    list_filter = ("status",)
+    readonly_fields = ("payload", "last_error")
+    empty_value_display = "-пусто-"
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
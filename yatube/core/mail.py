@@ -0,0 +1,155 @@
+"""Отправка писем через очередь.
+
+``QueuedEmailBackend`` только сохраняет письма в ``OutgoingEmail`` и
+ставит задачу ``core.tasks.send_queued_email`` — запрос сброса пароля не
+ждёт SMTP. Задача ставится с ``run_at`` и поэтому всегда уходит воркеру,
+даже при ``TASKS_EAGER``: без запущенного ``run_worker`` письма копятся
+в очереди. Задача забирает письма пачками и отправляет каждую пачку
+через одно соединение ``EMAIL_DELIVERY_BACKEND``, записывая задержку
+от постановки до отправки. Неотправленные письма повторяются с той же
+экспоненциальной задержкой, что и задачи.
+"""
+import base64
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import (
+    EmailMessage,
+    EmailMultiAlternatives,
+    get_connection,
+)
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.registry import enqueue
+from tasks.worker import backoff, ms_between
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger("yatube.mail")
+
+
+def dump_message(message):
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError("MIME-вложения в очереди не поддерживаются")
+        filename, content, mimetype = attachment
+        if isinstance(content, bytes):
+            content = {"base64": base64.b64encode(content).decode()}
+        attachments.append([filename, content, mimetype])
+    return Task.dump({
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": message.to,
+        "cc": message.cc,
+        "bcc": message.bcc,
+        "reply_to": message.reply_to,
+        "headers": message.extra_headers,
+        "alternatives": getattr(message, "alternatives", []),
+        "attachments": attachments,
+        "content_subtype": message.content_subtype,
+    })
+
+
+def load_message(payload):
+    data = Task.load(payload)
+    alternatives = [tuple(item) for item in data.pop("alternatives")]
+    attachments = data.pop("attachments")
+    content_subtype = data.pop("content_subtype")
+    if alternatives:
+        message = EmailMultiAlternatives(alternatives=alternatives, **data)
+    else:
+        message = EmailMessage(**data)
+    message.content_subtype = content_subtype
+    for filename, content, mimetype in attachments:
+        if isinstance(content, dict):
+            content = base64.b64decode(content["base64"])
+        message.attach(filename, content, mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        from .tasks import send_queued_email
+
+        if not email_messages:
+            return 0
+        OutgoingEmail.objects.bulk_create(
+            OutgoingEmail(payload=dump_message(message))
+            for message in email_messages
+        )
+        # Пачку писем из одного всплеска разберёт одна задача; если
+        # письмо разминётся с ней, его заберёт периодический запуск.
+        # run_at не даёт TASKS_EAGER отправить письма в этом же запросе.
+        enqueue(
+            send_queued_email,
+            run_at=timezone.now(),
+            unique_key="mail:outbox",
+        )
+        return len(email_messages)
+
+
+def claim_batch(size):
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    available = Q(status=OutgoingEmail.QUEUED, send_after__lte=now) & (
+        Q(claim="") | Q(claimed_at__lt=stale)
+    )
+    pks = list(
+        OutgoingEmail.objects.filter(available)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:size]
+    )
+    token = uuid.uuid4().hex
+    # Отправитель может быть не один: строку получает тот, чей UPDATE
+    # прошёл первым.
+    OutgoingEmail.objects.filter(available, pk__in=pks).update(
+        claim=token, claimed_at=now
+    )
+    return list(OutgoingEmail.objects.filter(claim=token).order_by("pk"))
+
+
+def deliver(connection, email):
+    now = timezone.now()
+    try:
+        connection.send_messages([load_message(email.payload)])
+    except Exception as error:
+        email.attempts += 1
+        email.last_error = repr(error)
+        if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            email.status = OutgoingEmail.FAILED
+        else:
+            email.send_after = now + timedelta(
+                seconds=backoff(email.attempts)
+            )
+        logger.warning("Письмо #%s не отправлено: %r", email.pk, error)
+    else:
+        email.attempts += 1
+        email.status = OutgoingEmail.SENT
+        email.sent_at = timezone.now()
+        email.latency_ms = ms_between(email.created, email.sent_at)
+        logger.info("Письмо #%s: %.1f мс", email.pk, email.latency_ms)
+    email.claim = ""
+    email.claimed_at = None
+    email.save()
+    return email.status == OutgoingEmail.SENT
+
+
+def send_outbox(batch_size=None):
+    """Отправляет все готовые письма и возвращает число отправленных."""
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    sent = 0
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return sent
+        connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+        with connection:
+            for email in batch:
+                sent += deliver(connection, email)
@@ -0,0 +1,158 @@
+"""Замер ленты под параллельной нагрузкой через WSGI-обработчик.
+
+Проект на Django 2.2: ASGI-обработчика и async-представлений в нём нет,
+поэтому команда измеряет только WSGI-развёртывание — потоки, как у
+многопоточного воркера, по клиенту и соединению с базой на поток. Это
+та точка отсчёта, с которой сравнивался бы перевод на ASGI после
+обновления Django. Кеш страниц (``cache_page`` ленты) на время замера
+отключается, иначе большинство запросов было бы чтением из кеша; вернуть
+его можно флагом ``--page-cache``.
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.middleware.cache import CacheMiddleware
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def current_rss_kb():
+    """Текущий RSS процесса; ``ru_maxrss`` — пик и назад не уменьшается."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def page_cache_disabled():
+    """Пропускает мимо кеша всё, что обёрнуто в ``cache_page``."""
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(
+        CacheMiddleware, "process_request", lambda self, request: None
+    ))
+    stack.enter_context(mock.patch.object(
+        CacheMiddleware,
+        "process_response",
+        lambda self, request, response: response,
+    ))
+    return stack
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает ленты параллельными запросами через WSGI-обработчик "
+        "в потоках: запросы в секунду, задержки и память на соединение."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1, 8, 32],
+            help="Уровни параллельности, по прогону на каждый.",
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--username",
+            help="Пользователь для ленты подписок /follow/.",
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Не отключать cache_page на время замера.",
+        )
+
+    def paths(self, user):
+        paths = [reverse("posts:index")]
+        group = Group.objects.order_by("pk").first()
+        if group:
+            paths.append(reverse("posts:group_list", args=(group.slug,)))
+        post = Post.objects.select_related("author").order_by("-pk").first()
+        if post:
+            paths.append(
+                reverse("posts:profile", args=(post.author.username,))
+            )
+            paths.append(reverse("posts:post_detail", args=(post.pk,)))
+        if user is not None:
+            paths.append(reverse("posts:follow_index"))
+        return paths
+
+    def handle(self, *args, **options):
+        user = None
+        if options["username"]:
+            user = User.objects.filter(username=options["username"]).first()
+            if user is None:
+                raise CommandError("Нет такого пользователя")
+        paths = self.paths(user)
+        # Вход один на всех: force_login в потоках писал бы в базу
+        # параллельно с замером.
+        cookies = None
+        if user is not None:
+            login = Client()
+            login.force_login(user)
+            cookies = login.cookies
+        local = threading.local()
+
+        def fetch(number):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client(HTTP_HOST="localhost")
+                if cookies is not None:
+                    client.cookies.update(cookies)
+            path = paths[number % len(paths)]
+            started = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f"{path}: {response.status_code}")
+            return elapsed
+
+        # При DEBUG каждое соединение копит свои запросы в
+        # connection.queries, и память росла бы от числа запросов.
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(DEBUG=False))
+            if not options["page_cache"]:
+                stack.enter_context(page_cache_disabled())
+            for concurrency in options["concurrency"]:
+                self.run(fetch, concurrency, options["requests"])
+
+    def run(self, fetch, concurrency, requests):
+        rss_before = current_rss_kb()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            timings = list(executor.map(fetch, range(requests)))
+            total = time.perf_counter() - started
+            # Потоки и их соединения с базой ещё живы.
+            rss_after = current_rss_kb()
+            list(executor.map(
+                lambda _: connections.close_all(), range(concurrency)
+            ))
+        if rss_before is None or rss_after is None:
+            memory = "память не измерить без /proc"
+        else:
+            per_connection = (rss_after - rss_before) / concurrency
+            memory = f"память {per_connection:+.0f} КБ на соединение"
+        self.stdout.write(
+            f"{concurrency} потоков: "
+            f"{len(timings) / total:.1f} запросов в секунду, "
+            f"p50 {statistics.median(timings) * 1000:.1f} мс, "
+            f"p95 {percentile(timings, 0.95) * 1000:.1f} мс, "
+            f"{memory}"
+        )
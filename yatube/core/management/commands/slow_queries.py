@@ -0,0 +1,81 @@
+import glob
+import json
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    return SPACES.sub(" ", IN_LIST.sub("IN (...)", sql)).strip()
+
+
+def read_records(path):
+    """Записи журнала, включая ротированные файлы, от старых к новым."""
+    backups = sorted(
+        glob.glob(f"{glob.escape(path)}.[0-9]*"),
+        key=lambda name: int(name.rsplit(".", 1)[1]),
+        reverse=True,
+    )
+    for name in backups + glob.glob(glob.escape(path)):
+        with open(name, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class Command(BaseCommand):
+    help = "Сводка по самым тяжёлым запросам из журнала медленных запросов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.SLOW_QUERY_LOG)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        stats = defaultdict(lambda: {
+            "count": 0,
+            "total": 0.0,
+            "max": 0.0,
+            "plan": None,
+            "sites": Counter(),
+        })
+        for record in read_records(options["log"]):
+            query = stats[fingerprint(record["sql"])]
+            duration = record["duration_ms"]
+            query["count"] += 1
+            query["total"] += duration
+            if duration >= query["max"]:
+                query["max"] = duration
+                query["plan"] = record.get("plan")
+            query["sites"][
+                (record.get("view"), record.get("template"),
+                 record.get("frame"))
+            ] += 1
+
+        worst = sorted(
+            stats.items(), key=lambda item: item[1]["total"], reverse=True
+        )[:options["limit"]]
+        if not worst:
+            self.stdout.write("Медленных запросов не найдено.")
+        for sql, query in worst:
+            self.stdout.write(
+                f"{query['total']:.1f} ms total, {query['count']} calls, "
+                f"avg {query['total'] / query['count']:.1f} ms, "
+                f"max {query['max']:.1f} ms"
+            )
+            self.stdout.write(f"  {sql}")
+            for line in query["plan"] or ():
+                self.stdout.write(f"  plan: {line}")
+            for (view, template, frame), count in (
+                query["sites"].most_common(3)
+            ):
+                self.stdout.write(
+                    f"  {count}x view={view} template={template} "
+                    f"frame={frame}"
+                )
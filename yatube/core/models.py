@@ -0,0 +1,34 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (SENT, "Отправлено"),
+        (FAILED, "Не отправлено"),
+    )
+
+    payload = models.TextField("Письмо")
+    status = models.CharField(
+        "Статус", max_length=10, choices=STATUSES, default=QUEUED
+    )
+    created = models.DateTimeField("Поставлено", auto_now_add=True)
+    send_after = models.DateTimeField("Отправить после", default=timezone.now)
+    claim = models.CharField("Захвачено", max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    sent_at = models.DateTimeField("Отправлено", null=True, blank=True)
+    latency_ms = models.FloatField("Задержка, мс", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        indexes = (models.Index(fields=("status", "send_after")),)
+
+    def __str__(self):
+        return f"Письмо #{self.pk} ({self.status})"
@@ -0,0 +1,125 @@
+"""Ограничение частоты запросов к записывающим и входным страницам.
+
+Каждая область (``scope``) описана в ``settings.RATE_LIMITS``: сколько
+запросов разрешено за период (``"5/m"``), кого считать — пользователя
+или IP — и какие методы. Ограничение — ведро на ``N`` жетонов, которое
+пополняется равномерно, по жетону раз в ``период / N``. Ведро хранится
+одним числом в кеше (GCRA): моментом в миллисекундах, к которому оно
+снова наполнится. Каждый запрос сдвигает этот момент атомарным ``incr``
+на один жетон — это единственное обращение к кешу на обычном пути.
+Отклонённый запрос тоже тратит жетон: кто долбит лимит, ждёт дольше,
+но не больше двух периодов. Пустое ведро даёт ответ 429 с
+``Retry-After`` до следующего жетона.
+"""
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """``"10/m"`` -> ``(10, 60)``; допускается и ``"10/5m"``."""
+    count, period = rate.split("/")
+    multiplier = period[:-1] or "1"
+    return int(count), int(multiplier) * PERIODS[period[-1]]
+
+
+def client_ip(request):
+    """IP клиента; за прокси — из заголовка ``RATE_LIMIT_IP_HEADER``.
+
+    Из ``X-Forwarded-For`` берётся последний адрес — тот, что дописал
+    наш прокси: остальные клиент может подставить сам.
+    """
+    header = settings.RATE_LIMIT_IP_HEADER
+    value = request.META.get(header, "") if header else ""
+    return value.split(",")[-1].strip() or request.META.get(
+        "REMOTE_ADDR", ""
+    )
+
+
+def client_key(request, kind):
+    if kind == "user" and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{client_ip(request)}"
+
+
+def take_token(key, capacity, period, now=None):
+    """Тратит жетон; возвращает, сколько секунд ждать, или 0.
+
+    Лишнее обращение к кешу нужно только первому запросу в ведро,
+    первому после простоя (ведро наполнилось, отсчёт идёт заново), раз
+    на ``capacity`` жетонов — продлить ключ — и когда долг упирается в
+    два периода.
+    """
+    now = int((time.time() if now is None else now) * 1000)
+    interval = period * 1000 // capacity
+    burst = period * 1000
+    key = f"ratelimit:{key}"
+    # Ключ продлевается не реже чем раз на burst мс долга, а долг не
+    # больше 2 * burst: так ключ всегда переживает свой долг и не
+    # истекает посреди непрерывной нагрузки.
+    timeout = 4 * period + 1
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, timeout):
+            return 0
+        full_at = cache.incr(key, interval)
+    previous = full_at - interval
+    if previous < now:
+        # Ведро простояло и наполнилось: отсчёт идёт от текущего момента.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at // burst != previous // burst:
+        cache.touch(key, timeout)
+    if full_at - now <= burst:
+        return 0
+    if full_at - now > 2 * burst:
+        full_at = now + 2 * burst
+        cache.set(key, full_at, timeout)
+    # Следующий запрос пройдёт, когда его жетон уложится в burst.
+    return max(math.ceil((full_at + interval - burst - now) / 1000), 1)
+
+
+def too_many_requests(request, retry_after):
+    response = render(
+        request,
+        "core/429.html",
+        {"retry_after": retry_after},
+        status=429,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def rate_limit(scope):
+    """Декоратор представления с лимитом из ``RATE_LIMITS[scope]``."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.RATE_LIMITS.get(scope)
+            if limit and request.method in limit.get("methods", ("POST",)):
+                capacity, period = parse_rate(limit["rate"])
+                ident = client_key(request, limit.get("key", "user"))
+                retry_after = take_token(
+                    f"{scope}:{ident}", capacity, period
+                )
+                if retry_after:
+                    logger.warning(
+                        "Превышен лимит %s для %s", scope, ident
+                    )
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
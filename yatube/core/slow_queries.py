@@ -0,0 +1,125 @@
+"""Журнал медленных SQL-запросов с планом выполнения и местом вызова."""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("yatube.slow_queries")
+
+PROJECT_DIR = os.path.join(settings.BASE_DIR, "")
+_local = threading.local()
+
+
+def _is_project_frame(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(PROJECT_DIR)
+        and filename != __file__
+        and f"{os.sep}tests{os.sep}" not in filename
+    )
+
+
+def find_call_site(depth=5):
+    """Ищет строку шаблона и кадры кода проекта, выполнившие запрос."""
+    stack = []
+    template_frame = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        if len(stack) < depth and _is_project_frame(frame):
+            stack.append(
+                f"{os.path.relpath(frame.f_code.co_filename, PROJECT_DIR)}:"
+                f"{frame.f_lineno} in {frame.f_code.co_name}"
+            )
+        if template_frame is None and frame.f_code.co_name == (
+            "render_annotated"
+        ):
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                template_frame = f"{origin.template_name}:{token.lineno}"
+        frame = frame.f_back
+    return stack, template_frame
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip()[:6].upper() == "SELECT":
+        return None
+    prefix = (
+        "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return [" ".join(map(str, row)) for row in cursor.fetchall()]
+
+
+class SlowQueryLogger:
+    """Обёртка для ``connection.execute_wrapper``.
+
+    Запросы дольше ``SLOW_QUERY_THRESHOLD_MS`` пишутся в журнал вместе
+    с параметрами, планом выполнения, представлением и местом вызова.
+    """
+
+    def __init__(self, request=None, threshold_ms=None):
+        self.request = request
+        if threshold_ms is None:
+            threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+        self.threshold = threshold_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "active", False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                _local.active = True
+                try:
+                    self.log(sql, params, many, duration, context)
+                finally:
+                    _local.active = False
+
+    def log(self, sql, params, many, duration, context):
+        stack, template_frame = find_call_site()
+        resolver_match = getattr(self.request, "resolver_match", None)
+        try:
+            plan = None if many else explain(
+                context["connection"], sql, params
+            )
+        except Exception as error:
+            plan = [f"EXPLAIN failed: {error}"]
+        logger.warning(json.dumps(
+            {
+                "sql": sql,
+                "params": None if many else params,
+                "duration_ms": round(duration * 1000, 3),
+                "plan": plan,
+                "view": resolver_match and resolver_match.view_name,
+                "template": template_frame,
+                "frame": stack[0] if stack else None,
+                "stack": stack,
+                "alias": context["connection"].alias,
+            },
+            default=str,
+            ensure_ascii=False,
+        ))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_logger = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_logger))
+            return self.get_response(request)
@@ -0,0 +1,152 @@
+"""Хранилища медиа- и статических файлов."""
+import fcntl
+import gzip
+import hashlib
+import os
+import re
+import uuid
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASHED_NAME = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$")
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".map", ".svg", ".ico", ".json", ".txt", ".xml", ".html",
+)
+MIN_COMPRESS_SIZE = 256
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Называет файлы по SHA-256 содержимого.
+
+    ``posts/photo.jpg`` сохраняется как ``posts/ab/cd/abcd….jpg``:
+    одинаковые загрузки попадают в один файл, а в каждом каталоге
+    остаётся не больше нескольких тысяч записей. Содержимое файла по
+    такому адресу не меняется, поэтому его можно кэшировать навсегда.
+    Удалять файл можно только когда на него не осталось ссылок,
+    см. ``posts.images.release_image``.
+
+    Запись и проверка перед удалением идут под блокировкой имени
+    (``lock``), общей для всех процессов: файл появляется целиком через
+    ``os.link`` временного файла, а уже существующий файл переиспользуется
+    и получает свежий mtime — так удаление видит, что его только что
+    выдали новой загрузке.
+    """
+
+    lock_directory = ".locks"
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f"{digest}{extension}"
+        ).replace("\\", "/")
+
+    @contextmanager
+    def lock(self, name):
+        """Межпроцессная блокировка имени (одна из 256 на каталог)."""
+        directory = self.path(self.lock_directory)
+        os.makedirs(directory, exist_ok=True)
+        stripe = hashlib.md5(name.encode()).hexdigest()[:2]
+        with open(os.path.join(directory, stripe), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temporary = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+        descriptor = os.open(
+            temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666
+        )
+        try:
+            with os.fdopen(descriptor, "wb") as target:
+                for chunk in content.chunks():
+                    target.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            with self.lock(name):
+                try:
+                    os.link(temporary, path)
+                except FileExistsError:
+                    # Такое же содержимое уже лежит под этим именем.
+                    os.utime(path)
+        finally:
+            os.remove(temporary)
+        return name
+
+    @staticmethod
+    def is_immutable(name):
+        return bool(HASHED_NAME.search(name))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и заранее сжатыми копиями.
+
+    ``collectstatic`` переименовывает файлы в ``name.<md5>.ext``,
+    переписывает ссылки в CSS и пишет манифест, по которому
+    ``{% static %}`` отдаёт хешированные имена. Рядом с текстовыми
+    файлами кладутся ``.gz`` и, если установлен ``brotli``, ``.br`` —
+    фронтовой сервер отдаёт их как есть (``gzip_static``/``brotli_static``)
+    с ``Cache-Control: immutable``.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        path = self.path(name)
+        with open(path, "rb") as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        compressors = [(".gz", gzip_compress)]
+        if brotli is not None:
+            compressors.append((".br", brotli.compress))
+        for suffix, compressor in compressors:
+            # Имя хешировано, так что готовый архив пересобирать незачем.
+            if os.path.exists(path + suffix):
+                continue
+            compressed = compressor(content)
+            if len(compressed) >= len(content):
+                continue
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+            yield name + suffix
+
+
+def gzip_compress(content):
+    # gzip.compress() принимает mtime только с Python 3.8.
+    buffer = BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode="wb", compresslevel=9, mtime=0
+    ) as compressed:
+        compressed.write(content)
+    return buffer.getvalue()
@@ -0,0 +1,11 @@
+from datetime import timedelta
+
+from tasks.registry import task
+
+from . import mail
+
+
+@task(every=timedelta(minutes=1))
+def send_queued_email():
+    """Отправляет письма из очереди, в том числе отложенные повторы."""
+    mail.send_outbox()
@@ -1,4 +1,37 @@
-from django.test import Client, TestCase
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from posts.models import Post, User
+from tasks.models import Task
+from tasks.worker import Worker
+
+from . import mail as queued_mail
+from .models import OutgoingEmail
+from .ratelimit import parse_rate, take_token
+from .storage import ContentAddressedStorage, brotli
+from .views import serve_media
 
 
 class CustomErrorsURLTests(TestCase):
@@ -19,3 +52,439 @@ class CustomErrorsURLTests(TestCase):
             with self.subTest(method=method):
                 response = getattr(self.guest_client, method)(address)
                 self.assertTemplateUsed(response, template)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_are_logged_with_call_site(self):
+        cache.clear()
+        user = User.objects.create_user("WithNoName")
+        Post.objects.create(text="test_text", author=user)
+        with self.assertLogs("yatube.slow_queries") as logs:
+            self.guest_client.get(reverse("posts:index"))
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        select = next(
+            record for record in records
+            if record["sql"].startswith("SELECT")
+            and "posts_post" in record["sql"]
+        )
+        self.assertEqual(select["view"], "posts:index")
+        self.assertTrue(select["plan"])
+        self.assertTrue(
+            any(
+                frame.startswith("posts/views.py")
+                for frame in select["stack"]
+            )
+        )
+        self.assertTrue(
+            any(
+                (record["template"] or "").startswith("posts/includes/")
+                for record in records
+            )
+        )
+
+    def test_summary_command(self):
+        record = {
+            "sql": "SELECT 1 WHERE id IN (%s, %s)",
+            "params": [1, 2],
+            "duration_ms": 150,
+            "plan": ["SCAN"],
+            "view": "posts:index",
+            "template": None,
+            "frame": "posts/views.py:1 in index",
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "slow.log")
+            with open(path, "w") as log:
+                log.write(json.dumps(record) + "\n")
+                log.write(json.dumps(dict(record, sql=(
+                    "SELECT 1 WHERE id IN (%s)"
+                ))) + "\n")
+            out = StringIO()
+            call_command("slow_queries", log=path, stdout=out)
+        self.assertIn("300.0 ms total, 2 calls", out.getvalue())
+        self.assertIn("SELECT 1 WHERE id IN (...)", out.getvalue())
+
+
+class BenchViewsTests(TransactionTestCase):
+    def test_benchmark_reports_each_concurrency_level(self):
+        author = User.objects.create_user("author")
+        Post.objects.create(text="Текст", author=author)
+        out = StringIO()
+        call_command(
+            "bench_views",
+            concurrency=[1, 2],
+            requests=5,
+            username="author",
+            stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("запросов в секунду", lines[1])
+        if os.path.exists("/proc/self/statm"):
+            self.assertIn("КБ на соединение", lines[1])
+
+    def test_benchmark_bypasses_page_cache(self):
+        with mock.patch(
+            "django.middleware.cache.learn_cache_key"
+        ) as learn_cache_key:
+            call_command(
+                "bench_views", concurrency=[1], requests=2, stdout=StringIO()
+            )
+        learn_cache_key.assert_not_called()
+        with mock.patch(
+            "django.middleware.cache.learn_cache_key"
+        ) as learn_cache_key:
+            call_command(
+                "bench_views",
+                concurrency=[1],
+                requests=2,
+                page_cache=True,
+                stdout=StringIO(),
+            )
+        learn_cache_key.assert_called()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_identical_uploads_share_one_sharded_file(self):
+        first = self.storage.save("posts/a.JPG", ContentFile(b"content"))
+        second = self.storage.save("posts/b.jpg", ContentFile(b"content"))
+        other = self.storage.save("posts/c.jpg", ContentFile(b"other"))
+        digest = hashlib.sha256(b"content").hexdigest()
+        self.assertEqual(
+            first, f"posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        )
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(ContentAddressedStorage.is_immutable(first))
+        self.assertFalse(ContentAddressedStorage.is_immutable("posts/a.jpg"))
+
+    def test_existing_file_is_reused_not_renamed(self):
+        name = self.storage.save("posts/a.jpg", ContentFile(b"content"))
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        # exists() опоздал: файл появился между проверкой и записью.
+        with mock.patch.object(self.storage, "exists", return_value=False):
+            again = self.storage.save("posts/b.jpg", ContentFile(b"content"))
+        self.assertEqual(again, name)
+        self.assertGreater(os.path.getmtime(path), 0)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [
+            os.path.basename(path)
+        ])
+
+    def test_hashed_media_is_served_with_immutable_cache(self):
+        name = self.storage.save("posts/a.jpg", ContentFile(b"content"))
+        with override_settings(MEDIA_ROOT=self.directory, MEDIA_SENDFILE=""):
+            request = RequestFactory().get(f"/media/{name}")
+            response = serve_media(request, name)
+        self.assertEqual(b"".join(response.streaming_content), b"content")
+        response.close()
+        self.assertIn("immutable", response["Cache-Control"])
+        digest = hashlib.sha256(b"content").hexdigest()
+        self.assertEqual(response["ETag"], f'"{digest}"')
+
+
+@override_settings(MEDIA_SENDFILE="nginx")
+class ServeMediaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+        self.name = self.storage.save("posts/a.jpg", ContentFile(b"content"))
+        os.makedirs(os.path.join(self.directory, "private"))
+        with open(os.path.join(self.directory, "private", "a.txt"), "w"):
+            pass
+        self.settings_override = override_settings(MEDIA_ROOT=self.directory)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_transfer_is_handed_to_front_server(self):
+        response = self.client.get(f"/media/{self.name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{self.name}"
+        )
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("Last-Modified", response)
+
+        with override_settings(MEDIA_SENDFILE="apache"):
+            response = self.client.get(f"/media/{self.name}")
+        self.assertEqual(
+            response["X-Sendfile"], os.path.join(self.directory, self.name)
+        )
+
+    def test_conditional_request_is_not_modified(self):
+        etag = self.client.get(f"/media/{self.name}")["ETag"]
+        response = self.client.get(
+            f"/media/{self.name}", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    def test_unpublished_paths_are_not_served(self):
+        for path in (
+            "private/a.txt",
+            "posts/../private/a.txt",
+            "posts/.hidden",
+            "posts/missing.jpg",
+            "posts/",
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(f"/media/{path}")
+                self.assertEqual(response.status_code, 404)
+        response = self.client.post(f"/media/{self.name}")
+        self.assertEqual(response.status_code, 405)
+
+
+class StaticManifestTests(TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, "css"))
+        os.makedirs(os.path.join(self.source, "img"))
+        with open(os.path.join(self.source, "img", "logo.png"), "wb") as f:
+            f.write(b"png")
+        self.css = (
+            b".logo { background: url('../img/logo.png'); }\n" * 20
+        )
+        with open(os.path.join(self.source, "css", "site.css"), "wb") as f:
+            f.write(self.css)
+        self.settings_override = override_settings(
+            STATICFILES_DIRS=(self.source,),
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                "core.storage.CompressedManifestStaticFilesStorage"
+            ),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.source, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_collectstatic_fingerprints_and_precompresses(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+        css_name = staticfiles_storage.stored_name("css/site.css")
+        logo_name = staticfiles_storage.stored_name("img/logo.png")
+        self.assertRegex(css_name, r"^css/site\.[0-9a-f]{12}\.css$")
+        self.assertRegex(logo_name, r"^img/logo\.[0-9a-f]{12}\.png$")
+        rendered = Template(
+            "{% load static %}{% static 'css/site.css' %}"
+        ).render(Context())
+        self.assertEqual(rendered, f"/static/{css_name}")
+
+        path = os.path.join(self.root, css_name)
+        with open(path, "rb") as f:
+            content = f.read()
+        self.assertIn(logo_name.split("/")[-1].encode(), content)
+        with gzip.open(path + ".gz") as f:
+            self.assertEqual(f.read(), content)
+        if brotli is not None:
+            with open(path + ".br", "rb") as f:
+                self.assertEqual(brotli.decompress(f.read()), content)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, logo_name) + ".gz")
+        )
+
+    def test_missing_manifest_entry_fails_loudly(self):
+        with self.assertRaises(ValueError):
+            staticfiles_storage.stored_name("css/site.css")
+
+
+@override_settings(
+    EMAIL_BACKEND="core.mail.QueuedEmailBackend",
+    EMAIL_DELIVERY_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    TASKS_EAGER=False,
+)
+class QueuedEmailTests(TestCase):
+    def test_messages_wait_for_worker_and_share_connection(self):
+        for number in range(3):
+            send_mail(f"Тема {number}", "Текст", "from@yatube.ru", ["a@b.c"])
+        message = EmailMultiAlternatives(
+            "HTML", "Текст", "from@yatube.ru", ["a@b.c"]
+        )
+        message.attach_alternative("<p>Текст</p>", "text/html")
+        message.attach("data.bin", b"\x00\x01", "application/octet-stream")
+        message.send()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmail.objects.count(), 4)
+        self.assertEqual(Task.objects.count(), 1)
+
+        with mock.patch.object(
+            queued_mail, "get_connection", wraps=queued_mail.get_connection
+        ) as get_connection:
+            Worker("test-worker").run_once()
+        get_connection.assert_called_once()
+        self.assertEqual(
+            [message.subject for message in mail.outbox],
+            ["Тема 0", "Тема 1", "Тема 2", "HTML"],
+        )
+        self.assertEqual(
+            mail.outbox[3].alternatives, [("<p>Текст</p>", "text/html")]
+        )
+        self.assertEqual(mail.outbox[3].attachments[0][1], b"\x00\x01")
+        for email in OutgoingEmail.objects.all():
+            self.assertEqual(email.status, OutgoingEmail.SENT)
+            self.assertGreaterEqual(email.latency_ms, 0)
+
+    def test_failed_delivery_is_retried(self):
+        send_mail("Тема", "Текст", "from@yatube.ru", ["a@b.c"])
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("smtp down"),
+        ), self.assertLogs("yatube.mail", "WARNING"):
+            self.assertEqual(queued_mail.send_outbox(), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.QUEUED)
+        self.assertEqual(email.claim, "")
+        self.assertIn("smtp down", email.last_error)
+        self.assertEqual(queued_mail.send_outbox(), 0)
+
+        OutgoingEmail.objects.update(send_after=email.created)
+        self.assertEqual(queued_mail.send_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_password_reset_is_queued(self):
+        User.objects.create_user(
+            "reader", email="reader@yatube.ru", password="password"
+        )
+        response = self.client.post(
+            reverse("users:password_reset_form"),
+            {"email": "reader@yatube.ru"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(queued_mail.send_outbox(), 1)
+        self.assertEqual(mail.outbox[0].to, ["reader@yatube.ru"])
+
+    @override_settings(TASKS_EAGER=True)
+    @mock.patch(
+        "tasks.registry.transaction.on_commit", lambda func: func()
+    )
+    def test_eager_mode_leaves_mail_to_worker(self):
+        send_mail("Тема", "Текст", "from@yatube.ru", ["a@b.c"])
+        self.assertEqual(mail.outbox, [])
+        task = Task.objects.get()
+        self.assertEqual(task.name, "core.tasks.send_queued_email")
+        Worker("test-worker").run_once()
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("limited", password="secret")
+        cls.author = User.objects.create_user("author")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("10/m"), (10, 60))
+        self.assertEqual(parse_rate("5/15m"), (5, 900))
+        self.assertEqual(parse_rate("1/d"), (1, 86400))
+
+    def test_bucket_refills_gradually(self):
+        # 3 жетона в минуту: по жетону каждые 20 секунд.
+        for _ in range(3):
+            self.assertEqual(take_token("test", 3, 60, now=120.5), 0)
+        # Отклонённый запрос тоже тратит жетон.
+        self.assertEqual(take_token("test", 3, 60, now=121), 40)
+        self.assertEqual(take_token("test", 3, 60, now=160.5), 0)
+        self.assertEqual(take_token("test", 3, 60, now=160.5), 40)
+        # Долг не растёт больше двух периодов.
+        for _ in range(20):
+            retry_after = take_token("test", 3, 60, now=161)
+        self.assertEqual(retry_after, 80)
+        self.assertEqual(take_token("test", 3, 60, now=241), 0)
+        # После простоя ведро полное, граница минуты лишнего не даёт.
+        for _ in range(3):
+            self.assertEqual(take_token("test", 3, 60, now=600), 0)
+        self.assertEqual(take_token("test", 3, 60, now=600), 40)
+
+    @mock.patch("time.time")
+    def test_bucket_under_steady_use_outlives_timeout(self, clock):
+        clock.return_value = 1000.0
+        for _ in range(3):
+            self.assertEqual(take_token("steady", 3, 60), 0)
+        # Жетон в 20 секунд, ровно по лимиту, дольше таймаута ключа.
+        for step in range(1, 30):
+            clock.return_value = 1000.0 + 20 * step
+            self.assertEqual(take_token("steady", 3, 60), 0)
+        self.assertNotEqual(take_token("steady", 3, 60), 0)
+
+    @override_settings(RATE_LIMITS={
+        "post_create": {"rate": "2/m", "key": "user", "methods": ["POST"]},
+    })
+    def test_create_returns_429_with_retry_after(self):
+        url = reverse("posts:post_create")
+        for _ in range(2):
+            response = self.client.post(url, {"text": "пост"})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {"text": "пост"})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response["Retry-After"]) <= 60)
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+
+    @override_settings(RATE_LIMITS={
+        "profile_follow": {"rate": "3/m", "key": "user", "methods": ["GET"]},
+    })
+    @mock.patch("time.time", return_value=1000.0)
+    def test_limit_costs_one_cache_round_trip(self, clock):
+        url = reverse("posts:profile_follow", args=[self.author.username])
+        self.client.get(url)
+        with mock.patch("core.ratelimit.cache", wraps=cache) as spy:
+            self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(
+            [call[0] for call in spy.method_calls], ["incr"]
+        )
+
+    @override_settings(RATE_LIMITS={
+        "login": {"rate": "1/h", "key": "ip", "methods": ["POST"]},
+    })
+    def test_login_is_limited_per_ip(self):
+        self.client.logout()
+        url = reverse("users:login")
+        data = {"username": "limited", "password": "wrong"}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        response = self.client.post(url, data, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+
+    @override_settings(
+        RATE_LIMITS={"login": {"rate": "1/h", "key": "ip"}},
+        RATE_LIMIT_IP_HEADER="HTTP_X_FORWARDED_FOR",
+    )
+    def test_ip_is_taken_from_the_proxy_header(self):
+        self.client.logout()
+        url = reverse("users:login")
+        data = {"username": "limited", "password": "wrong"}
+        for client_ip in ("1.1.1.1", "2.2.2.2"):
+            response = self.client.post(
+                url, data, HTTP_X_FORWARDED_FOR=f"9.9.9.9, {client_ip}"
+            )
+            self.assertEqual(response.status_code, 200)
+        # Подставленный клиентом адрес слева не помогает.
+        response = self.client.post(
+            url, data, HTTP_X_FORWARDED_FOR="3.3.3.3, 1.1.1.1"
+        )
+        self.assertEqual(response.status_code, 429)
@@ -1,4 +1,27 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import ContentAddressedStorage
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+SITEMAP_NAME = re.compile(r"^sitemap(-[a-z]+-\d+)?\.xml$")
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
 
 
 def page_not_found(request, exception):
@@ -7,3 +30,109 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=""):
     return render(request, "core/403csrf.html")
+
+
+def media_path(path):
+    """Путь к опубликованному медиафайлу или 404."""
+    path = posixpath.normpath(path).lstrip("/")
+    parts = path.split("/")
+    if (
+        not path.startswith(tuple(settings.MEDIA_PUBLIC_PREFIXES))
+        or any(part.startswith(".") for part in parts)
+    ):
+        raise Http404
+    return path
+
+
+def media_etag(path, stat_result):
+    if ContentAddressedStorage.is_immutable(path):
+        digest = os.path.splitext(posixpath.basename(path))[0]
+        return f'"{digest}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def media_response(path, full_path):
+    """Ответ, который передаёт байты файла фронтовому серверу."""
+    backend = settings.MEDIA_SENDFILE
+    if backend == "nginx":
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path
+        )
+    elif backend == "apache":
+        response = HttpResponse()
+        response["X-Sendfile"] = full_path
+    else:
+        return FileResponse(open(full_path, "rb"))
+    content_type = mimetypes.guess_type(path)[0]
+    response["Content-Type"] = content_type or "application/octet-stream"
+    return response
+
+
+def media_file_response(request, path):
+    """Ответ с файлом ``path`` из MEDIA_ROOT или 304 по его ETag."""
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    etag = media_etag(path, stat_result)
+    last_modified = int(stat_result.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = media_response(path, full_path)
+        response["Last-Modified"] = http_date(last_modified)
+    response["ETag"] = etag
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдаёт медиафайл из MEDIA_ROOT.
+
+    Django проверяет путь и условные заголовки, а сами байты отправляет
+    nginx или Apache (см. ``MEDIA_SENDFILE``), так что воркеры не
+    заняты передачей картинок. Файлы с адресацией по содержимому
+    кэшируются навсегда.
+    """
+    path = media_path(path)
+    response = media_file_response(request, path)
+    if ContentAddressedStorage.is_immutable(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_MAX_AGE
+        )
+    return response
+
+
+@require_safe
+def serve_sitemap(request, name="sitemap.xml"):
+    """Отдаёт готовую карту сайта, сжатую копию — если клиент её примет.
+
+    Файлы собирает ``python manage.py generate_sitemaps``; здесь они
+    только отдаются, как медиафайлы.
+    """
+    if not SITEMAP_NAME.match(name):
+        raise Http404
+    path = posixpath.join(settings.SITEMAP_DIR, name)
+    gzipped = ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if gzipped:
+        path += ".gz"
+    response = media_file_response(request, path)
+    if response.status_code == 200:
+        response["Content-Type"] = "application/xml; charset=utf-8"
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    patch_cache_control(
+        response, public=True, max_age=settings.SITEMAP_MAX_AGE
+    )
+    return response
@@ -16,6 +16,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    readonly_fields = ('views',)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # views пишет только счётчик просмотров, прибавлением в базе:
+        # значение, загруженное вместе с постом, уже могло устареть.
+        obj.save(update_fields=[
+            field.name
+            for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'views'
+        ])
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,211 @@
+"""JSON API лент только для чтения.
+
+Строки читаются через ``values_list`` — модели ``Post`` и ``Comment``
+не создаются. ``?fields=id,text`` оставляет в ответе (и в SELECT)
+только нужные поля, ``?cursor=`` продолжает ленту с места, где
+закончилась прошлая страница, ``?limit=`` задаёт её длину. Ответ
+помечен ETag от тела: повторный запрос с ``If-None-Match`` получает
+пустой 304.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views.decorators.http import require_safe
+
+from .models import Comment, Group, Post, User
+from .utils import cursor_for, decode_cursor
+
+POST_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "image_width": "image_width",
+    "image_height": "image_height",
+    "views": "views",
+}
+COMMENT_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+}
+IMAGE_STORAGE = Post._meta.get_field("image").storage
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """GET/HEAD-представление, отвечающее на ошибки JSON-ом."""
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            message, status = "Не найдено", 404
+        except ApiError as error:
+            message, status = str(error), error.status
+        return JsonResponse({"detail": message}, status=status)
+
+    return wrapper
+
+
+def parse_fields(request, available):
+    fields = request.GET.get("fields")
+    if not fields:
+        return list(available)
+    names = list(dict.fromkeys(name for name in fields.split(",") if name))
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+    return names
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get("limit", settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit должен быть целым числом")
+    if limit < 1:
+        raise ApiError("limit должен быть больше нуля")
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def serialize(names, row):
+    """Словарь из первых ``len(names)`` колонок строки."""
+    item = dict(zip(names, row))
+    if item.get("image"):
+        item["image"] = IMAGE_STORAGE.url(item["image"])
+    elif "image" in item:
+        item["image"] = None
+    return item
+
+
+def get_page(request, queryset, available, order_field, descending=True):
+    """Страница строк после курсора и курсор следующей.
+
+    Ключевая пагинация по ``(order_field, pk)``: к запрошенным полям
+    всегда добавляются две колонки, из которых собирается курсор.
+    """
+    names = parse_fields(request, available)
+    limit = parse_limit(request)
+    direction = "lt" if descending else "gt"
+    prefix = "-" if descending else ""
+    queryset = queryset.order_by(prefix + order_field, prefix + "pk")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            moment, pk = decode_cursor(cursor)
+        except (ValueError, OverflowError):
+            raise ApiError("Неверный курсор")
+        queryset = queryset.filter(
+            Q(**{f"{order_field}__{direction}": moment})
+            | Q(**{order_field: moment, f"pk__{direction}": pk})
+        )
+    lookups = [available[name] for name in names] + [order_field, "pk"]
+    rows = list(queryset.values_list(*lookups)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_for(rows[-1][-2], rows[-1][-1])
+    return {
+        "results": [serialize(names, row) for row in rows],
+        "next": next_cursor,
+    }
+
+
+def api_response(request, data, private=False):
+    content = json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False
+    ).encode()
+    etag = f'"{hashlib.md5(content).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    if private:
+        patch_cache_control(
+            response, private=True, max_age=settings.API_MAX_AGE
+        )
+        patch_vary_headers(response, ["Cookie"])
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.API_MAX_AGE
+        )
+    return response
+
+
+def post_page(request, queryset, private=False):
+    page = get_page(request, queryset, POST_FIELDS, "pub_date")
+    return api_response(request, page, private)
+
+
+@api_view
+def index(request):
+    return post_page(request, Post.objects.all())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only("pk"), slug=slug)
+    return post_page(request, Post.objects.filter(group_id=group.pk))
+
+
+@api_view
+def profile(request, username):
+    author = get_object_or_404(User.objects.only("pk"), username=username)
+    return post_page(request, Post.objects.filter(author_id=author.pk))
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        raise ApiError("Нужна авторизация", status=403)
+    posts = Post.objects.filter(author__following__user=request.user)
+    return post_page(request, posts, private=True)
+
+
+@api_view
+def post_detail(request, post_id):
+    names = parse_fields(request, POST_FIELDS)
+    row = (
+        Post.objects.filter(pk=post_id)
+        .values_list(*(POST_FIELDS[name] for name in names))
+        .first()
+    )
+    if row is None:
+        raise Http404
+    return api_response(request, serialize(names, row))
+
+
+@api_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = get_page(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        "created",
+        descending=False,
+    )
+    return api_response(request, page)
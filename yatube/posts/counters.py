@@ -0,0 +1,97 @@
+"""Отложенная запись счётчиков просмотров.
+
+Просмотр поста только увеличивает число в памяти процесса. Раз в
+``VIEW_COUNTER_FLUSH_INTERVAL`` секунд (или когда ждут записи больше
+``VIEW_COUNTER_MAX_PENDING`` постов) накопленное пишется одним
+``UPDATE … SET views = views + CASE id WHEN … END`` на пачку — после
+ответа, в обработчике ``request_finished``. При падении процесса
+теряется не больше одного интервала просмотров. Читать число нужно
+через ``view_count``: оно складывает сохранённое и ждущее записи.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Post
+from .tasks import record_activity
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def increment(self, post_id, count=1):
+        with self._lock:
+            self._pending[post_id] += count
+
+    def pending(self, post_id):
+        with self._lock:
+            return self._pending[post_id]
+
+    def is_due(self):
+        return (
+            len(self._pending) >= settings.VIEW_COUNTER_MAX_PENDING
+            or time.monotonic() - self._flushed_at
+            >= settings.VIEW_COUNTER_FLUSH_INTERVAL
+        )
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        self._flushed_at = time.monotonic()
+        return pending
+
+    def flush(self, force=True):
+        """Пишет накопленное в базу; возвращает число обновлённых постов."""
+        if not self._pending or not (force or self.is_due()):
+            return 0
+        # Пишет один поток; остальные не ждут его и копят дальше.
+        if not self._flush_lock.acquire(blocking=force):
+            return 0
+        try:
+            pending = self.take()
+            items = sorted(pending.items())
+            size = settings.VIEW_COUNTER_BATCH
+            for start in range(0, len(items), size):
+                batch = items[start:start + size]
+                try:
+                    write_batch(batch)
+                except Exception:
+                    logger.exception("Не удалось записать просмотры")
+                    # Не записанное вернётся в следующую попытку.
+                    for post_id, count in items[start:]:
+                        self.increment(post_id, count)
+                    return start
+                try:
+                    record_activity.delay("view", batch)
+                except Exception:
+                    logger.exception("Просмотры не учтены в популярном")
+            return len(items)
+        finally:
+            self._flush_lock.release()
+
+
+def write_batch(batch):
+    Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).update(
+        views=F("views") + Case(
+            *(When(pk=post_id, then=Value(count)) for post_id, count in batch),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def view_count(post):
+    return post.views + view_counter.pending(post.pk)
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,111 @@
+"""Живые обновления лент через Server-Sent Events.
+
+Сохранение нового поста будит ``broker`` — ждущие потоки этого
+процесса сразу перечитывают базу. Источник событий всё равно база
+(``pk > последнего отданного``), поэтому посты, созданные в других
+процессах, приходят не позже следующего опроса раз в
+``POST_EVENTS_POLL_INTERVAL`` секунд, а переподключившийся клиент
+по ``Last-Event-ID`` получает всё пропущенное.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.template.loader import render_to_string
+
+from .models import Post
+from .thumbnails import attach_thumbnails
+
+CARD_CACHE_TIMEOUT = 5 * 60
+
+
+class Broker:
+    """Внутрипроцессный pub/sub: помнит только id последнего поста."""
+
+    def __init__(self):
+        self.latest = 0
+        self._condition = threading.Condition()
+
+    def publish(self, post_id):
+        with self._condition:
+            self.latest = max(self.latest, post_id)
+            self._condition.notify_all()
+
+    def wait(self, seen, timeout):
+        """Ждёт поста новее ``seen``; возвращает id последнего поста."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.latest > seen, timeout)
+            return self.latest
+
+
+broker = Broker()
+
+
+def latest_post_id():
+    return Post.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+
+def new_posts(after, author_ids=None):
+    posts = (
+        Post.objects.select_related("author", "group")
+        .filter(pk__gt=after)
+        .order_by("pk")
+    )
+    if author_ids is not None:
+        posts = posts.filter(author_id__in=author_ids)
+    return list(posts[:settings.POST_EVENTS_BATCH])
+
+
+def render_cards(posts):
+    """HTML карточек; карточка не зависит от зрителя и рендерится раз."""
+    keys = {post.pk: f"posts:card:{post.pk}" for post in posts}
+    cards = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    if missing:
+        attach_thumbnails(missing)
+        rendered = {
+            keys[post.pk]: render_to_string(
+                "posts/includes/post.html", {"post": post}
+            )
+            for post in missing
+        }
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [cards[keys[post.pk]] for post in posts]
+
+
+def format_event(post, html):
+    data = json.dumps({
+        "id": post.pk,
+        "author": post.author.username,
+        "html": html,
+    })
+    return f"id: {post.pk}\nevent: post\ndata: {data}\n\n"
+
+
+def stream_events(after, author_ids=None):
+    """Поток событий о постах новее ``after``.
+
+    Соединение закрывается через ``POST_EVENTS_MAX_DURATION`` секунд:
+    под WSGI каждый слушатель держит поток, а браузер сам
+    переподключится через ``retry``.
+    """
+    yield f"retry: {settings.POST_EVENTS_RETRY_MS}\n\n"
+    deadline = time.monotonic() + settings.POST_EVENTS_MAX_DURATION
+    seen = broker.latest
+    while time.monotonic() < deadline:
+        posts = new_posts(after, author_ids)
+        if posts:
+            after = posts[-1].pk
+            for post, html in zip(posts, render_cards(posts)):
+                yield format_event(post, html)
+            continue
+        # Пока ждём, соединение с базой не держим.
+        close_old_connections()
+        latest = broker.wait(seen, settings.POST_EVENTS_POLL_INTERVAL)
+        if latest == seen:
+            yield ": keepalive\n\n"
+        seen = latest
@@ -0,0 +1,89 @@
+"""Потоковая выгрузка постов и комментариев автора в JSONL/CSV."""
+import csv
+import json
+
+from .models import Comment, Post
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_COLUMNS = (
+    "type",
+    "id",
+    "post_id",
+    "date",
+    "group",
+    "image",
+    "text",
+)
+
+
+def author_rows(author, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки: сначала посты, затем комментарии автора.
+
+    Модели не создаются, строки читаются пачками по ``chunk_size``,
+    поэтому память не зависит от числа записей.
+    """
+    posts = (
+        Post.objects.filter(author=author)
+        .order_by("pk")
+        .values_list("pk", "pub_date", "group__slug", "image", "text")
+    )
+    for pk, pub_date, group, image, text in posts.iterator(chunk_size):
+        yield {
+            "type": "post",
+            "id": pk,
+            "post_id": pk,
+            "date": pub_date.isoformat(),
+            "group": group,
+            "image": image,
+            "text": text,
+        }
+    comments = (
+        Comment.objects.filter(author=author)
+        .order_by("pk")
+        .values_list("pk", "post_id", "created", "text")
+    )
+    for pk, post_id, created, text in comments.iterator(chunk_size):
+        yield {
+            "type": "comment",
+            "id": pk,
+            "post_id": post_id,
+            "date": created.isoformat(),
+            "group": None,
+            "image": None,
+            "text": text,
+        }
+
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row[column] for column in EXPORT_COLUMNS)
+
+
+RENDERERS = {
+    "jsonl": render_jsonl,
+    "csv": render_csv,
+}
+
+
+def export_author(author, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Генератор строк выгрузки автора в формате ``export_format``."""
+    return RENDERERS[export_format](author_rows(author, chunk_size))
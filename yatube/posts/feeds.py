@@ -0,0 +1,209 @@
+"""RSS и Atom: вся лента, группа и автор.
+
+Фид строится из ``FEED_ITEMS`` новейших постов по индексам
+``(-pub_date)``, ``(group, -pub_date)`` и ``(author, -pub_date)`` и
+целиком кладётся в кеш вместе с ETag и временем сборки. Ссылки в фиде
+абсолютные, поэтому схема и хост входят в ключ. Области — ``"index"``,
+``"group:<id>"`` и ``"author:<id>"``: сигналам поста хватает его
+``group_id`` и ``author_id``, а slug и username переводит в id само
+представление. У области есть номер версии, он тоже входит в ключ.
+Сохранение или удаление поста атомарно увеличивает версии ленты, его
+группы и автора (``invalidate_feeds`` из сигналов), и старые копии
+просто перестают читаться. Опрос агрегатором стоит двух чтений кеша (и
+поиска id для группы или автора), а при совпавшем ETag или
+If-Modified-Since — пустого 304.
+"""
+import hashlib
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+
+from .models import Group, Post, User
+
+
+def feed_version_key(scope):
+    return f"posts:feed:version:{scope}"
+
+
+def feed_cache_key(kind, scope, version, origin):
+    return f"posts:feed:{kind}:{scope}:{version}:{origin}"
+
+
+def initial_version():
+    # Ключ версии могли вытеснить: новая нумерация начинается с момента
+    # времени, чтобы не совпасть с версиями, которые ещё лежат в кеше.
+    return int(time.time() * 1000)
+
+
+def feed_version(scope):
+    key = feed_version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_feeds(scopes):
+    """Сбрасывает фиды областей ``"index"``, ``"group:<id>"`` и т.п."""
+    for scope in scopes:
+        key = feed_version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, initial_version(), None):
+                cache.incr(key)
+
+
+class CachedFeed(Feed, ABC):
+    kind = "rss"
+
+    @abstractmethod
+    def cache_scope(self, **kwargs):
+        """Область кеша по аргументам адреса; 404, если объекта нет."""
+
+    def render(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        return {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "etag": f'"{hashlib.md5(response.content).hexdigest()}"',
+            "last_modified": int(time.time()),
+        }
+
+    def __call__(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        scope = self.cache_scope(**kwargs)
+        key = feed_cache_key(
+            self.kind,
+            scope,
+            feed_version(scope),
+            request.build_absolute_uri("/"),
+        )
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.render(request, *args, **kwargs)
+            cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+        response = get_conditional_response(
+            request,
+            etag=cached["etag"],
+            last_modified=cached["last_modified"],
+        )
+        if response is None:
+            response = HttpResponse(
+                cached["content"], content_type=cached["content_type"]
+            )
+        response["ETag"] = cached["etag"]
+        response["Last-Modified"] = http_date(cached["last_modified"])
+        patch_cache_control(
+            response, public=True, max_age=settings.FEED_MAX_AGE
+        )
+        return response
+
+    def latest(self, posts):
+        return posts.select_related("author").order_by("-pub_date", "-pk")[
+            :settings.FEED_ITEMS
+        ]
+
+    def item_title(self, item):
+        lines = item.text.strip().splitlines()
+        return lines[0][:80] if lines else f"Пост {item.pk}"
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse("posts:post_detail", args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class IndexFeed(CachedFeed):
+    title = "Yatube: новые посты"
+    link = reverse_lazy("posts:index")
+    description = "Последние записи всех авторов"
+
+    def cache_scope(self):
+        return "index"
+
+    def items(self):
+        return self.latest(Post.objects.all())
+
+
+class GroupFeed(CachedFeed):
+    def cache_scope(self, slug):
+        group = get_object_or_404(Group.objects.only("pk"), slug=slug)
+        return f"group:{group.pk}"
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f"Yatube: {group.title}"
+
+    def link(self, group):
+        return reverse("posts:group_list", args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+    def items(self, group):
+        return self.latest(Post.objects.filter(group_id=group.pk))
+
+
+class AuthorFeed(CachedFeed):
+    def cache_scope(self, username):
+        author = get_object_or_404(User.objects.only("pk"), username=username)
+        return f"author:{author.pk}"
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f"Yatube: {author.get_full_name() or author.username}"
+
+    def link(self, author):
+        return reverse("posts:profile", args=[author.username])
+
+    def description(self, author):
+        return f"Записи пользователя {author.username}"
+
+    def items(self, author):
+        return self.latest(Post.objects.filter(author_id=author.pk))
+
+
+class IndexAtomFeed(IndexFeed):
+    kind = "atom"
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    kind = "atom"
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AuthorAtomFeed(AuthorFeed):
+    kind = "atom"
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
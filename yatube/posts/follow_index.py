@@ -0,0 +1,310 @@
+"""Индекс графа подписок в памяти процесса.
+
+Рёбра ``Follow`` хранятся дважды, в CSR на ``array``: по подписчику
+(на кого он подписан) и по автору (кто на него подписан). Вершины —
+отсортированный массив id, поиск в нём и в срезе соседей идёт через
+``bisect``, так что степень и «подписан ли A на B» отвечаются без
+запросов к базе и без словаря на каждую вершину: 8 байт на id в срезе
+плюс 16 байт на вершину. Подписки и отписки после загрузки копятся в
+небольших дельтах и вливаются в массивы пересборкой.
+
+Процессы узнают о чужих подписках через журнал в кеше: счётчик
+``FOLLOW_INDEX_SEQ_KEY`` и по ключу на событие. Каждый процесс не чаще
+раза в ``FOLLOW_INDEX_SYNC_INTERVAL`` секунд дочитывает новые события;
+если журнал потерян, индекс загружается из базы заново.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_INDEX_SEQ_KEY = "posts:follows:seq"
+FOLLOW_INDEX_EVENT_KEY = "posts:follows:event:{}"
+LOAD_CHUNK = 10000
+
+
+class Adjacency:
+    """Рёбра, сгруппированные по первой вершине пары."""
+
+    def __init__(self, pairs):
+        """``pairs`` — пары ``(вершина, сосед)``, отсортированные."""
+        self.nodes = array("q")
+        self.indptr = array("q", [0])
+        self.targets = array("q")
+        last = None
+        for node, target in pairs:
+            if node != last:
+                if last is not None:
+                    self.indptr.append(len(self.targets))
+                self.nodes.append(node)
+                last = node
+            self.targets.append(target)
+        if last is not None:
+            self.indptr.append(len(self.targets))
+
+    @property
+    def nbytes(self):
+        return sum(
+            part.itemsize * len(part)
+            for part in (self.nodes, self.indptr, self.targets)
+        )
+
+    def bounds(self, node):
+        i = bisect_left(self.nodes, node)
+        if i < len(self.nodes) and self.nodes[i] == node:
+            return self.indptr[i], self.indptr[i + 1]
+        return 0, 0
+
+    def degree(self, node):
+        start, end = self.bounds(node)
+        return end - start
+
+    def contains(self, node, target):
+        start, end = self.bounds(node)
+        i = bisect_left(self.targets, target, start, end)
+        return i < end and self.targets[i] == target
+
+    def neighbours(self, node):
+        start, end = self.bounds(node)
+        return self.targets[start:end]
+
+    def pairs(self):
+        for i, node in enumerate(self.nodes):
+            for j in range(self.indptr[i], self.indptr[i + 1]):
+                yield node, self.targets[j]
+
+
+class FollowIndex:
+    def __init__(self, pairs=()):
+        """``pairs`` — пары ``(user_id, author_id)`` в любом порядке."""
+        pairs = sorted(set(pairs))
+        self.following = Adjacency(pairs)
+        self.followers = Adjacency(sorted((a, u) for u, a in pairs))
+        self.added = {}
+        self.removed = {}
+        self.added_in = {}
+        self.removed_in = {}
+        self.pending = 0
+
+    @classmethod
+    def from_database(cls):
+        pairs = Follow.objects.order_by().values_list("user_id", "author_id")
+        return cls(pairs.iterator(chunk_size=LOAD_CHUNK))
+
+    def __len__(self):
+        return (
+            len(self.following.targets)
+            + sum(map(len, self.added.values()))
+            - sum(map(len, self.removed.values()))
+        )
+
+    @property
+    def nbytes(self):
+        return self.following.nbytes + self.followers.nbytes
+
+    @property
+    def bytes_per_edge(self):
+        return self.nbytes / max(len(self.following.targets), 1)
+
+    def follows(self, user_id, author_id):
+        if author_id in self.added.get(user_id, ()):
+            return True
+        if author_id in self.removed.get(user_id, ()):
+            return False
+        return self.following.contains(user_id, author_id)
+
+    def is_mutual(self, user_id, author_id):
+        return self.follows(user_id, author_id) and self.follows(
+            author_id, user_id
+        )
+
+    def following_count(self, user_id):
+        return (
+            self.following.degree(user_id)
+            + len(self.added.get(user_id, ()))
+            - len(self.removed.get(user_id, ()))
+        )
+
+    def followers_count(self, author_id):
+        return (
+            self.followers.degree(author_id)
+            + len(self.added_in.get(author_id, ()))
+            - len(self.removed_in.get(author_id, ()))
+        )
+
+    def following_ids(self, user_id):
+        ids = set(self.following.neighbours(user_id))
+        ids -= self.removed.get(user_id, set())
+        return ids | self.added.get(user_id, set())
+
+    def follower_ids(self, author_id):
+        ids = set(self.followers.neighbours(author_id))
+        ids -= self.removed_in.get(author_id, set())
+        return ids | self.added_in.get(author_id, set())
+
+    def followed_by_followees(self, user_id, author_id, limit=3):
+        """Те, на кого подписан ``user_id``, из подписчиков автора.
+
+        Перебирается меньший из двух списков, второй проверяется
+        поиском в массиве.
+        """
+        if self.following_count(user_id) <= self.followers_count(author_id):
+            ids = [
+                pk
+                for pk in self.following_ids(user_id)
+                if self.follows(pk, author_id)
+            ]
+        else:
+            ids = [
+                pk
+                for pk in self.follower_ids(author_id)
+                if self.follows(user_id, pk)
+            ]
+        return sorted(pk for pk in ids if pk != author_id)[:limit]
+
+    def follow(self, user_id, author_id):
+        if self.follows(user_id, author_id):
+            return
+        if author_id in self.removed.get(user_id, ()):
+            self._discard(self.removed, user_id, author_id)
+            self._discard(self.removed_in, author_id, user_id)
+            self.pending -= 1
+        else:
+            self.added.setdefault(user_id, set()).add(author_id)
+            self.added_in.setdefault(author_id, set()).add(user_id)
+            self.pending += 1
+
+    def unfollow(self, user_id, author_id):
+        if not self.follows(user_id, author_id):
+            return
+        if author_id in self.added.get(user_id, ()):
+            self._discard(self.added, user_id, author_id)
+            self._discard(self.added_in, author_id, user_id)
+            self.pending -= 1
+        else:
+            self.removed.setdefault(user_id, set()).add(author_id)
+            self.removed_in.setdefault(author_id, set()).add(user_id)
+            self.pending += 1
+
+    def compact(self):
+        """Новый индекс с дельтами, влитыми в массивы."""
+        pairs = [
+            (user_id, author_id)
+            for user_id, author_id in self.following.pairs()
+            if author_id not in self.removed.get(user_id, ())
+        ]
+        for user_id, authors in self.added.items():
+            pairs.extend((user_id, author_id) for author_id in authors)
+        return FollowIndex(pairs)
+
+    @staticmethod
+    def _discard(delta, node, target):
+        targets = delta[node]
+        targets.discard(target)
+        if not targets:
+            del delta[node]
+
+
+class SharedFollowIndex:
+    """Индекс процесса, догоняющий журнал событий в кеше."""
+
+    def __init__(self):
+        self._index = None
+        self._seq = 0
+        self._missing = None
+        self._synced_at = 0.0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            expired = (
+                now - self._loaded_at > settings.FOLLOW_INDEX_MAX_AGE
+            )
+            if self._index is None or expired:
+                self._load(now)
+            elif now - self._synced_at >= settings.FOLLOW_INDEX_SYNC_INTERVAL:
+                self._sync(now)
+            return self._index
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+
+    def publish(self, event, user_id, author_id):
+        """Записывает подписку или отписку в журнал; вызывать после коммита."""
+        cache.add(FOLLOW_INDEX_SEQ_KEY, 0, None)
+        try:
+            seq = cache.incr(FOLLOW_INDEX_SEQ_KEY)
+        except ValueError:
+            # Счётчик вытеснили между add и incr: журнал потерян.
+            self.reset()
+            return
+        cache.set(
+            FOLLOW_INDEX_EVENT_KEY.format(seq),
+            (event, user_id, author_id),
+            settings.FOLLOW_INDEX_EVENT_TIMEOUT,
+        )
+        with self._lock:
+            if self._index is not None:
+                self._sync(time.monotonic())
+
+    def _load(self, now):
+        # Номер берётся до выгрузки: события во время загрузки
+        # применятся повторно, а подписка и отписка идемпотентны.
+        self._seq = cache.get(FOLLOW_INDEX_SEQ_KEY, 0)
+        self._missing = None
+        started = time.perf_counter()
+        self._index = FollowIndex.from_database()
+        logger.info(
+            "Индекс подписок: %d рёбер, %.1f байт на ребро, %.2f с",
+            len(self._index),
+            self._index.bytes_per_edge,
+            time.perf_counter() - started,
+        )
+        self._loaded_at = self._synced_at = now
+
+    def _sync(self, now):
+        self._synced_at = now
+        latest = cache.get(FOLLOW_INDEX_SEQ_KEY, 0)
+        if latest < self._seq or (
+            latest - self._seq > settings.FOLLOW_INDEX_MAX_DELTA
+        ):
+            self._load(now)
+            return
+        if latest == self._seq:
+            return
+        keys = [
+            FOLLOW_INDEX_EVENT_KEY.format(seq)
+            for seq in range(self._seq + 1, latest + 1)
+        ]
+        events = cache.get_many(keys)
+        for key in keys:
+            if key not in events:
+                # Событие могли ещё не записать; если его нет и при
+                # следующей сверке, журнал потерян.
+                if self._missing == key:
+                    self._load(now)
+                    return
+                self._missing = key
+                break
+            event, user_id, author_id = events[key]
+            if event == "follow":
+                self._index.follow(user_id, author_id)
+            else:
+                self._index.unfollow(user_id, author_id)
+            self._seq += 1
+        if self._index.pending > settings.FOLLOW_INDEX_MAX_DELTA:
+            self._index = self._index.compact()
+
+
+follow_graph = SharedFollowIndex()
@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from .images import process_image
 from .models import Comment, Post
 
 
@@ -22,6 +24,12 @@ class PostForm(ModelForm):
             "image": "^^^Изображение для иллюстрации вашего поста^^^",
         }
 
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if isinstance(image, UploadedFile):
+            return process_image(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
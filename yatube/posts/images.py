@@ -0,0 +1,170 @@
+"""Проверка и нормализация загружаемых картинок постов.
+
+Размер и формат читаются из заголовка без полного декодирования.
+Большие JPEG декодируются сразу в уменьшенном виде (draft-режим),
+EXIF удаляется, результат пишется во временный файл на диске. Анимация
+(GIF, WebP) уменьшается покадрово и сохраняет все кадры и их
+длительность; лимит пикселей для неё считается по всем кадрам.
+"""
+import base64
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps, ImageSequence
+from sorl.thumbnail import delete
+
+from .models import Post
+from .thumbnails import image_file
+
+logger = logging.getLogger(__name__)
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 90, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 90},
+    "GIF": {},
+}
+PLACEHOLDER_SIZE = 16
+# Значения EXIF Orientation, при которых ширина и высота меняются местами.
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def target_size(width, height, max_side):
+    scale = min(1, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def save_animation(image, size, output, options):
+    """Пишет в ``output`` все кадры анимации в размере ``size``."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", 100))
+        frames.append(frame.convert("RGBA").resize(size, Image.LANCZOS))
+    if image.format == "GIF":
+        options = dict(options, disposal=2)
+    frames[0].save(
+        output,
+        image.format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get("loop", 0),
+        **options,
+    )
+
+
+def process_image(upload):
+    """Возвращает файл для сохранения вместо ``upload``.
+
+    Бросает ``ValidationError``, если формат не поддерживается или
+    в картинке больше ``POST_IMAGE_MAX_PIXELS`` пикселей.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            "Файл слишком большой", code="file_too_large"
+        )
+    if hasattr(upload, "temporary_file_path"):
+        source = upload.temporary_file_path()
+    else:
+        upload.seek(0)
+        source = upload
+    with Image.open(source) as image:
+        if image.format not in SAVE_OPTIONS:
+            raise ValidationError(
+                "Неподдерживаемый формат картинки", code="invalid_format"
+            )
+        width, height = image.size
+        frame_count = getattr(image, "n_frames", 1)
+        if width * height * frame_count > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                "Картинка больше %(limit)s мегапикселей",
+                code="too_many_pixels",
+                params={
+                    "limit": settings.POST_IMAGE_MAX_PIXELS // 1_000_000
+                },
+            )
+        size = target_size(width, height, settings.POST_IMAGE_MAX_SIDE)
+        oversized = size != (width, height)
+        # В GIF нет EXIF, а перекодирование потеряет анимацию.
+        if not oversized and (image.format == "GIF" or not image.getexif()):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        options = dict(SAVE_OPTIONS[image_format], exif=b"")
+        icc_profile = image.info.get("icc_profile")
+        if icc_profile:
+            options["icc_profile"] = icc_profile
+        output = tempfile.TemporaryFile()
+        if frame_count > 1:
+            save_animation(image, size, output, options)
+        else:
+            if image_format == "JPEG":
+                image.draft(image.mode, size)
+            normalized = ImageOps.exif_transpose(image)
+            if oversized:
+                max_side = settings.POST_IMAGE_MAX_SIDE
+                normalized.thumbnail((max_side, max_side), Image.LANCZOS)
+            normalized.save(output, image_format, **options)
+    output.seek(0)
+    return File(output, name=os.path.basename(upload.name))
+
+
+def image_metadata(file):
+    """Размеры картинки и крошечное превью в виде data URI.
+
+    JPEG декодируется в draft-режиме сразу в размере превью.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        image.draft("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        preview = ImageOps.exif_transpose(image).convert("RGB")
+    file.seek(0)
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = BytesIO()
+    preview.save(buffer, "JPEG", quality=60)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return (width, height), f"data:image/jpeg;base64,{encoded}"
+
+
+def release_image(name, grace=None):
+    """Удаляет картинку и её миниатюры, если на неё не ссылается ни один пост.
+
+    Одинаковые загрузки хранятся в одном файле, поэтому число ссылок на
+    файл — это число постов с таким ``image``; поле проиндексировано.
+    Проверка и удаление идут под блокировкой имени в хранилище. Файл,
+    который хранилище выдало загрузке последние
+    ``grace`` (по умолчанию ``POST_IMAGE_RELEASE_GRACE``) секунд, не
+    трогаем: пост с ним может быть ещё не сохранён в базе. Его позже
+    уберёт collect_media_garbage, который удаляет через эту же функцию.
+    Возвращает, удалён ли файл.
+    """
+    if not name:
+        return False
+    if grace is None:
+        grace = settings.POST_IMAGE_RELEASE_GRACE
+    storage = Post._meta.get_field("image").storage
+    with storage.lock(name):
+        if Post.objects.filter(image=name).exists():
+            return False
+        try:
+            mtime = os.path.getmtime(storage.path(name))
+        except OSError:
+            mtime = 0
+        if time.time() - mtime < grace:
+            return False
+        try:
+            # Вместе с картинкой sorl удалит её миниатюры и записи о них.
+            delete(image_file(name))
+        except Exception:
+            logger.exception("Не удалось удалить картинку %s", name)
+            return False
+    return True
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts.images import release_image
+from posts.media_gc import (
+    orphaned_images,
+    orphaned_thumbnails,
+    registered_thumbnails,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет картинки постов и миниатюры, на которые больше не "
+        "ссылается ни один пост."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать, сколько места освободится.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Пауза между пачками удалений, в секундах.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Не трогать файлы моложе стольких секунд.",
+        )
+
+    def handle(self, *args, **options):
+        # Миниатюры удаляемых картинок sorl удаляет вместе с ними, и
+        # проход по миниатюрам их уже не найдёт: они считаются здесь,
+        # чтобы отчёт --dry-run совпадал с настоящим удалением.
+        attached = [0, 0]
+
+        def release(batch):
+            thumbnails = registered_thumbnails([name for name, _ in batch])
+            released = []
+            for item in batch:
+                if not options["dry_run"] and not release_image(
+                    item[0], grace=options["min_age"]
+                ):
+                    continue
+                released.append(item)
+                attached[0] += len(thumbnails[item[0]])
+                attached[1] += sum(size for _, size in thumbnails[item[0]])
+            return released
+
+        self.collect("картинки", orphaned_images, release, options)
+
+        def delete_thumbnails(batch):
+            if not options["dry_run"]:
+                for name, _ in batch:
+                    default.storage.delete(name)
+            return batch
+
+        self.collect(
+            "миниатюры", orphaned_thumbnails, delete_thumbnails, options,
+            count=attached[0], size=attached[1],
+        )
+
+    def collect(self, title, find_orphans, remove, options, count=0, size=0):
+        """``remove`` удаляет пачку и возвращает действительно удалённое."""
+        for batch in find_orphans(options["batch_size"], options["min_age"]):
+            if options["verbosity"] > 1:
+                for name, _ in batch:
+                    self.stdout.write(name)
+            removed = remove(batch)
+            count += len(removed)
+            size += sum(file_size for _, file_size in removed)
+            if not options["dry_run"] and options["sleep"]:
+                time.sleep(options["sleep"])
+        action = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(f"{action} {title}: {count} файлов, {size} байт")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_author
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка постов и комментариев автора в JSONL/CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="jsonl"
+        )
+        parser.add_argument(
+            "--output", help="Файл для выгрузки, по умолчанию stdout."
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(
+                f"Пользователь {options['username']} не найден"
+            )
+        lines = export_author(
+            author, options["format"], options["chunk_size"]
+        )
+        if options["output"] is None:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(
+            options["output"], "w", encoding="utf-8", newline=""
+        ) as output:
+            output.writelines(lines)
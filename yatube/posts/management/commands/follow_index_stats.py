@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.follow_index import FollowIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает индекс подписок и печатает его размер, память на "
+        "ребро и время запросов. С --benchmark — на случайном графе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--benchmark",
+            type=int,
+            metavar="EDGES",
+            help="Число рёбер случайного графа, например 1000000.",
+        )
+        parser.add_argument("--queries", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        started = time.perf_counter()
+        if options["benchmark"]:
+            users = max(options["benchmark"] // 20, 2)
+            index = FollowIndex(
+                (rng.randrange(users), rng.randrange(users))
+                for _ in range(options["benchmark"])
+            )
+        else:
+            index = FollowIndex.from_database()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Индекс: {len(index)} подписок, "
+            f"{index.nbytes / 2 ** 20:.1f} МБ, "
+            f"{index.bytes_per_edge:.1f} байт на ребро, {elapsed:.2f} с"
+        )
+        nodes = index.following.nodes or [0]
+        pairs = [
+            (rng.choice(nodes), rng.choice(nodes))
+            for _ in range(options["queries"])
+        ]
+        for name, query in (
+            ("подписан ли", index.follows),
+            ("взаимно ли", index.is_mutual),
+        ):
+            started = time.perf_counter()
+            for user_id, author_id in pairs:
+                query(user_id, author_id)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{name}: {elapsed / len(pairs) * 1e6:.2f} мкс на запрос"
+            )
+        started = time.perf_counter()
+        for user_id, _ in pairs:
+            index.followers_count(user_id)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"число подписчиков: {elapsed / len(pairs) * 1e6:.2f} мкс "
+            "на запрос"
+        )
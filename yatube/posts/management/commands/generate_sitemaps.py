@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.sitemaps import generate, sitemap_root
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает изменившиеся файлы карты сайта. "
+        "С --full — все файлы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = generate(full=options["full"])
+        self.stdout.write(
+            f"Карта сайта в {sitemap_root()}: перестроено файлов — "
+            f"{written}, {time.perf_counter() - started:.2f} с"
+        )
@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import build_thumbnails, register_thumbnails
+
+
+def build_safely(name, force):
+    try:
+        return build_thumbnails(name, force)
+    except Exception as error:
+        return name, None, str(error)
+
+
+class InlineExecutor:
+    """Исполнитель без процессов для --workers=0."""
+
+    def map(self, func, *iterables):
+        return map(func, *iterables)
+
+    def shutdown(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает миниатюры всех картинок постов в пуле процессов "
+        "и пачками регистрирует их в KV-хранилище sorl."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Число процессов, 0 — без пула.",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл с последним обработанным id для продолжения.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестраивать и уже существующие файлы.",
+        )
+
+    def handle(self, *args, **options):
+        start_pk = self.read_checkpoint(options["checkpoint"])
+        posts = (
+            Post.objects.exclude(image="")
+            .filter(pk__gt=start_pk)
+            .order_by("pk")
+        )
+        total = posts.count()
+        rows = posts.values_list("pk", "image").iterator(
+            options["batch_size"]
+        )
+        if options["workers"]:
+            executor = ProcessPoolExecutor(
+                options["workers"], initializer=django.setup
+            )
+        else:
+            executor = InlineExecutor()
+        done = failed = 0
+        started = time.monotonic()
+        try:
+            for last_pk, names in self.batches(rows, options["batch_size"]):
+                results = []
+                for name, size, built in executor.map(
+                    build_safely, names, [options["force"]] * len(names)
+                ):
+                    if size is None:
+                        failed += 1
+                        self.stderr.write(f"{name}: {built}")
+                    else:
+                        results.append((name, size, built))
+                register_thumbnails(results)
+                self.write_checkpoint(options["checkpoint"], last_pk)
+                done += len(names)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{done}/{total} картинок, "
+                    f"{done / elapsed if elapsed else 0:.1f} в секунду, "
+                    f"ошибок: {failed}"
+                )
+        finally:
+            executor.shutdown()
+        if options["checkpoint"] and os.path.exists(options["checkpoint"]):
+            os.remove(options["checkpoint"])
+
+    @staticmethod
+    def batches(rows, batch_size):
+        """Пачки уникальных имён картинок и последний id в пачке."""
+        names = {}
+        last_pk = None
+        for pk, name in rows:
+            names.setdefault(name)
+            last_pk = pk
+            if len(names) >= batch_size:
+                yield last_pk, list(names)
+                names = {}
+        if names:
+            yield last_pk, list(names)
+
+    @staticmethod
+    def read_checkpoint(path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            return json.load(checkpoint)["last_pk"]
+
+    @staticmethod
+    def write_checkpoint(path, last_pk):
+        if not path:
+            return
+        with open(f"{path}.tmp", "w") as checkpoint:
+            json.dump({"last_pk": last_pk}, checkpoint)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import (
+    MAX_PAIRS,
+    SUGGESTIONS_COUNT,
+    FollowGraph,
+    store_suggestions,
+    synthetic_graph,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рекомендации «кого почитать» по графу подписок. "
+        "С --benchmark только замеряет расчёт на случайном графе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=SUGGESTIONS_COUNT)
+        parser.add_argument(
+            "--max-pairs",
+            type=int,
+            default=MAX_PAIRS,
+            help="Предел путей длины два в одной пачке пользователей.",
+        )
+        parser.add_argument(
+            "--benchmark",
+            type=int,
+            metavar="EDGES",
+            help="Число рёбер случайного графа, например 1000000.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options["benchmark"]:
+            graph = synthetic_graph(options["benchmark"])
+        else:
+            graph = FollowGraph.from_database()
+        loaded = time.perf_counter()
+        self.stdout.write(
+            f"Граф: {graph.size} пользователей, {len(graph.indices)} "
+            f"подписок, {graph.nbytes / 2 ** 20:.1f} МБ, "
+            f"{loaded - started:.2f} с"
+        )
+        if options["benchmark"]:
+            pairs = 0
+            for rows in graph.chunks(options["max_pairs"]):
+                pairs += len(graph.suggest(rows, options["k"])[0])
+        else:
+            pairs = store_suggestions(
+                graph, options["k"], options["max_pairs"]
+            )
+        elapsed = time.perf_counter() - loaded
+        self.stdout.write(
+            f"Рекомендации: {pairs} строк за {elapsed:.2f} с, "
+            f"{graph.size / max(elapsed, 1e-9):.0f} пользователей в секунду"
+        )
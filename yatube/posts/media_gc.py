@@ -0,0 +1,122 @@
+"""Поиск картинок и миниатюр, на которые больше не ссылаются посты.
+
+Файлы обходятся потоково, каталог за каталогом, и сверяются с базой
+пачками: одна выборка по индексу на пачку, без загрузки полного списка
+файлов или ссылок в память.
+"""
+import os
+import re
+import time
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .models import Post
+from .thumbnails import image_file, kvstore_get_many
+
+ALTERNATIVE_RESOLUTION = re.compile(r"@[\d.]+x(?=\.\w+$)")
+
+
+def iter_files(root, directory=""):
+    """(имя относительно ``root``, размер, mtime) всех файлов каталога.
+
+    Записи идут в порядке ``scandir``: сортировка держала бы в памяти
+    весь каталог.
+    """
+    try:
+        entries = os.scandir(os.path.join(root, directory))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f"{directory}/{entry.name}" if directory else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                yield name, stat.st_size, stat.st_mtime
+
+
+def batches(files, batch_size, min_age):
+    """Пачки достаточно старых файлов: свежие могут ещё не попасть в БД."""
+    deadline = time.time() - min_age
+    batch = []
+    for name, size, mtime in files:
+        if mtime > deadline:
+            continue
+        batch.append((name, size))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def orphaned_images(batch_size, min_age):
+    """Пачки картинок из ``upload_to``, которых нет ни в одном посте."""
+    field = Post._meta.get_field("image")
+    directory = field.upload_to.strip("/")
+    files = iter_files(field.storage.location, directory)
+    for batch in batches(files, batch_size, min_age):
+        referenced = set(
+            Post.objects.filter(
+                image__in=[name for name, _ in batch]
+            ).values_list("image", flat=True)
+        )
+        orphans = [item for item in batch if item[0] not in referenced]
+        if orphans:
+            yield orphans
+
+
+def registered_thumbnails(names):
+    """Миниатюры, которые sorl удалит вместе с картинками ``names``.
+
+    Возвращает ``{картинка: [(имя, размер), …]}``.
+    """
+    storage = default.storage
+    list_keys = {
+        add_prefix(image_file(name).key, identity="thumbnails"): name
+        for name in names
+    }
+    owners = {
+        add_prefix(key): list_keys[list_key]
+        for list_key, value in kvstore_get_many(list(list_keys)).items()
+        for key in deserialize(value)
+    }
+    thumbnails = {name: [] for name in names}
+    for key, value in kvstore_get_many(list(owners)).items():
+        name = deserialize_image_file(value).name
+        try:
+            thumbnails[owners[key]].append((name, storage.size(name)))
+        except OSError:
+            continue
+    return thumbnails
+
+
+def orphaned_thumbnails(batch_size, min_age):
+    """Пачки файлов миниатюр, неизвестных KV-хранилищу sorl.
+
+    Миниатюры удалённых картинок sorl удаляет вместе с их записями,
+    поэтому файл без записи в KV-хранилище никому не нужен.
+    """
+    storage = default.storage
+    directory = sorl_settings.THUMBNAIL_PREFIX.strip("/")
+    files = iter_files(storage.location, directory)
+    for batch in batches(files, batch_size, min_age):
+        raw_keys = {
+            name: add_prefix(
+                ImageFile(
+                    ALTERNATIVE_RESOLUTION.sub("", name), storage
+                ).key
+            )
+            for name, _ in batch
+        }
+        registered = kvstore_get_many(list(raw_keys.values()))
+        orphans = [
+            item for item in batch if raw_keys[item[0]] not in registered
+        ]
+        if orphans:
+            yield orphans
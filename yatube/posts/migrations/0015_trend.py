@@ -0,0 +1,27 @@
+# Generated by Django 2.2.19 on 2026-10-19 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trend',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5)),
+                ('object_id', models.PositiveIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('updated', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trend',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_trend_kind_object'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -33,11 +34,29 @@ class Post(models.Model):
     image = models.ImageField(
         "Картинка",
         upload_to="posts/",
+        storage=ContentAddressedStorage(),
         blank=True,
+        db_index=True,
+    )
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(blank=True, editable=False)
+    views = models.PositiveIntegerField(
+        "Просмотры", default=0, editable=False
     )
 
     class Meta:
         ordering = ["-pub_date"]
+        # Ленты и фиды берут N новейших постов: всей ленты, группы, автора.
+        indexes = (
+            models.Index(fields=("-pub_date",)),
+            models.Index(fields=("group", "-pub_date")),
+            models.Index(fields=("author", "-pub_date")),
+        )
 
     def __str__(self):
         return str(self.text)[:15]
@@ -59,6 +78,10 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Комментарии поста читаются страницами по (created, id).
+        indexes = (models.Index(fields=("post", "created")),)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -79,3 +102,56 @@ class Follow(models.Model):
                 name="unique_user_author",
             )
         ]
+
+
+class Trend(models.Model):
+    """Экспоненциально затухающий рейтинг поста или группы.
+
+    ``score`` приведён к моменту ``updated``; к текущему моменту его
+    приводит ``posts.trending.decay``.
+    """
+
+    POST = "post"
+    GROUP = "group"
+    KINDS = ((POST, "Пост"), (GROUP, "Группа"))
+
+    kind = models.CharField(max_length=5, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    score = models.FloatField(default=0)
+    updated = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"],
+                name="unique_trend_kind_object",
+            )
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Готовая рекомендация «кого почитать».
+
+    Строки пересчитывает ``manage.py suggest_follows``; строки без
+    ``user`` — самые читаемые авторы для тех, у кого подписок нет.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follow_suggestions",
+        null=True,
+        blank=True,
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    generation = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ("rank",)
+        indexes = (models.Index(fields=("user", "rank")),)
@@ -0,0 +1,182 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Таблица ``Follow`` выгружается в массивы и сжимается в CSR:
+``indptr[u]:indptr[u + 1]`` — срез ``indices`` с теми, на кого
+подписан ``u``. Кандидаты пользователя — авторы, на которых подписаны
+его авторы; их вес — число таких общих подписок, при равенстве выше
+более читаемый. Пары «пользователь — кандидат» считаются векторно
+через ``np.unique`` пачками пользователей, чтобы промежуточные массивы
+не превышали ``max_pairs`` элементов.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Follow, FollowSuggestion
+
+SUGGESTIONS_COUNT = 10
+MAX_PAIRS = 5_000_000
+INSERT_BATCH = 5000
+DELETE_BATCH = 500
+
+
+class FollowGraph:
+    def __init__(self, src, dst, ids=None):
+        """``src[i]`` подписан на ``dst[i]``; id — любые целые числа."""
+        if ids is None:
+            ids = np.unique(np.concatenate((src, dst)))
+        self.ids = ids
+        self.size = len(ids)
+        src = np.searchsorted(ids, src)
+        dst = np.searchsorted(ids, dst)
+        order = np.argsort(src, kind="stable")
+        self.indices = dst[order]
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(src, minlength=self.size), out=self.indptr[1:]
+        )
+        self.out_degree = np.diff(self.indptr)
+        self.in_degree = np.bincount(dst, minlength=self.size)
+
+    @classmethod
+    def from_database(cls, chunk_size=100_000):
+        edges = Follow.objects.order_by().values_list("user_id", "author_id")
+        flat = np.fromiter(
+            (node for edge in edges.iterator(chunk_size) for node in edge),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return cls(flat[:, 0], flat[:, 1])
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.ids.nbytes
+
+    def expand(self, rows):
+        """Соседи всех ``rows`` подряд и номер строки каждого соседа."""
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        owner = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return owner, self.indices[np.repeat(starts, counts) + offsets]
+
+    def chunks(self, max_pairs):
+        """Пачки вершин не больше чем с ``max_pairs`` путями длины два."""
+        steps = np.concatenate(
+            ([0], np.cumsum(self.out_degree[self.indices]))
+        )
+        two_hops = steps[self.indptr[1:]] - steps[self.indptr[:-1]]
+        start = 0
+        total = 0
+        for node in range(self.size):
+            if total and total + two_hops[node] > max_pairs:
+                yield np.arange(start, node)
+                start, total = node, 0
+            total += two_hops[node]
+        if start < self.size:
+            yield np.arange(start, self.size)
+
+    def suggest(self, rows, k=SUGGESTIONS_COUNT):
+        """Лучшие ``k`` кандидатов для вершин ``rows``.
+
+        Возвращает массивы ``(row, candidate, score, rank)``.
+        """
+        owner, followed = self.expand(rows)
+        hop_owner, candidates = self.expand(followed)
+        users = owner[hop_owner]
+        keys = users * self.size + candidates
+        known = np.concatenate((
+            owner * self.size + followed,
+            np.arange(len(rows)) * self.size + rows,
+        ))
+        keys = keys[~np.isin(keys, known)]
+        keys, scores = np.unique(keys, return_counts=True)
+        users, candidates = np.divmod(keys, self.size)
+        order = np.lexsort((-self.in_degree[candidates], -scores, users))
+        users, candidates, scores = (
+            users[order], candidates[order], scores[order]
+        )
+        first = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+        sizes = np.diff(np.r_[first, len(users)])
+        ranks = np.arange(len(users)) - np.repeat(first, sizes)
+        keep = ranks < k
+        return rows[users[keep]], candidates[keep], scores[keep], ranks[keep]
+
+    def popular(self, k=SUGGESTIONS_COUNT):
+        order = np.argsort(-self.in_degree, kind="stable")[:k]
+        return order[self.in_degree[order] > 0]
+
+
+def store_suggestions(graph, k=SUGGESTIONS_COUNT, max_pairs=MAX_PAIRS):
+    """Пересчитывает ``FollowSuggestion``; возвращает число строк."""
+    latest = FollowSuggestion.objects.aggregate(Max("generation"))
+    generation = (latest["generation__max"] or 0) + 1
+    stored = 0
+    for rows in graph.chunks(max_pairs):
+        users, candidates, scores, ranks = graph.suggest(rows, k)
+        suggestions = [
+            FollowSuggestion(
+                user_id=int(graph.ids[user]),
+                candidate_id=int(graph.ids[candidate]),
+                score=float(score),
+                rank=int(rank),
+                generation=generation,
+            )
+            for user, candidate, score, rank in zip(
+                users, candidates, scores, ranks
+            )
+        ]
+        user_ids = graph.ids[rows].tolist()
+        with transaction.atomic():
+            for start in range(0, len(user_ids), DELETE_BATCH):
+                FollowSuggestion.objects.filter(
+                    user_id__in=user_ids[start:start + DELETE_BATCH]
+                ).delete()
+            FollowSuggestion.objects.bulk_create(suggestions, INSERT_BATCH)
+        stored += len(suggestions)
+    popular = graph.popular(k)
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user=None).delete()
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(
+                candidate_id=int(graph.ids[candidate]),
+                score=float(graph.in_degree[candidate]),
+                rank=rank,
+                generation=generation,
+            )
+            for rank, candidate in enumerate(popular)
+        )
+        # Те, кто выпал из графа целиком.
+        FollowSuggestion.objects.filter(generation__lt=generation).delete()
+    return stored + len(popular)
+
+
+def follow_suggestions(user, limit=5):
+    """Рекомендации для ``user`` — два запроса по индексу."""
+    suggestions = (
+        FollowSuggestion.objects.select_related("candidate")
+        .exclude(candidate__following__user=user)
+        .exclude(candidate=user)
+    )
+    personal = list(suggestions.filter(user=user)[:limit])
+    if personal:
+        return [suggestion.candidate for suggestion in personal]
+    return [
+        suggestion.candidate
+        for suggestion in suggestions.filter(user=None)[:limit]
+    ]
+
+
+def synthetic_graph(edges, users=None, seed=0):
+    """Случайный граф со степенным распределением популярности."""
+    rng = np.random.default_rng(seed)
+    users = users or max(edges // 20, 2)
+    src = rng.integers(0, users, edges)
+    dst = (rng.pareto(1.2, edges) * users / 50).astype(np.int64) % users
+    loops = src == dst
+    dst[loops] = (dst[loops] + 1) % users
+    pairs = np.unique(src * users + dst)
+    return FollowGraph(
+        *np.divmod(pairs, users), ids=np.arange(users, dtype=np.int64)
+    )
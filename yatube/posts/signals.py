@@ -0,0 +1,137 @@
+import logging
+
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from tasks.registry import enqueue
+
+from .counters import view_counter
+from .events import broker
+from .feeds import invalidate_feeds
+from .follow_index import follow_graph
+from .images import image_metadata
+from .models import Comment, Follow, Post
+from .tasks import build_post_thumbnails, record_activity, release_post_image
+
+logger = logging.getLogger(__name__)
+
+
+def stored_image_name(instance):
+    # Не трогаем дескриптор: поле может быть отложено через only().
+    image = instance.__dict__.get("image")
+    return str(image) if image else None
+
+
+@receiver(post_init, sender=Post)
+def remember_post_image(sender, instance, **kwargs):
+    instance._stored_image = stored_image_name(instance)
+    instance._stored_group_id = instance.__dict__.get("group_id")
+
+
+@receiver(pre_save, sender=Post)
+def store_image_metadata(sender, instance, **kwargs):
+    image = instance.image
+    if not image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ""
+        return
+    if image._committed:
+        return
+    try:
+        size, placeholder = image_metadata(image.file)
+    except Exception:
+        logger.exception("Не удалось прочитать картинку %s", image.name)
+        size, placeholder = (None, None), ""
+    instance.image_width, instance.image_height = size
+    instance.image_placeholder = placeholder
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, **kwargs):
+    name = instance.image.name
+    stored = getattr(instance, "_stored_image", None)
+    instance._stored_image = name
+    if not created and stored and stored != name:
+        release_post_image.delay(stored)
+    if name:
+        size = None
+        if instance.image_width and instance.image_height:
+            size = (instance.image_width, instance.image_height)
+        enqueue(
+            build_post_thumbnails,
+            (name, size),
+            unique_key=f"thumbnails:{name}",
+        )
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    name = stored_image_name(instance)
+    if name:
+        release_post_image.delay(name)
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    if created:
+        post_id = instance.pk
+        transaction.on_commit(lambda: broker.publish(post_id))
+        record_activity.delay("post", [[post_id, 1]])
+
+
+def feed_scopes(post, group_ids):
+    scopes = {"index", f"author:{post.author_id}"}
+    scopes.update(f"group:{group_id}" for group_id in group_ids)
+    return scopes
+
+
+@receiver(post_save, sender=Post)
+def post_feeds_saved(sender, instance, **kwargs):
+    group_ids = {instance.group_id, instance._stored_group_id} - {None}
+    instance._stored_group_id = instance.group_id
+    scopes = feed_scopes(instance, group_ids)
+    transaction.on_commit(lambda: invalidate_feeds(scopes))
+
+
+@receiver(post_delete, sender=Post)
+def post_feeds_deleted(sender, instance, **kwargs):
+    scopes = feed_scopes(instance, {instance.group_id} - {None})
+    transaction.on_commit(lambda: invalidate_feeds(scopes))
+
+
+@receiver(post_save, sender=Comment)
+def record_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        record_activity.delay("comment", [[instance.post_id, 1]])
+
+
+@receiver(post_save, sender=Follow)
+def publish_follow(sender, instance, created, **kwargs):
+    if created:
+        user_id, author_id = instance.user_id, instance.author_id
+        transaction.on_commit(
+            lambda: follow_graph.publish("follow", user_id, author_id)
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def publish_unfollow(sender, instance, **kwargs):
+    user_id, author_id = instance.user_id, instance.author_id
+    transaction.on_commit(
+        lambda: follow_graph.publish("unfollow", user_id, author_id)
+    )
+
+
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    # close_old_connections уже отработал: соединение, которое открыла
+    # запись, закрываем по тем же правилам (CONN_MAX_AGE).
+    if view_counter.flush(force=False):
+        close_old_connections()
@@ -0,0 +1,216 @@
+"""Карта сайта для поисковиков: посты, профили и группы.
+
+Каждый раздел режется на файлы по диапазонам id: в файле
+``SITEMAP_SHARD_SIZE`` (по протоколу не больше 50 000) идущих подряд id,
+значит, и не больше стольких адресов. Файл пишется потоком из
+``values_list(...).iterator()`` сразу в ``.xml`` и ``.xml.gz`` в
+``MEDIA_ROOT/SITEMAP_DIR``; отдаёт их ``core.views.serve_sitemap``.
+
+Перестраиваются только изменившиеся файлы. Отпечаток файла — число
+строк, наибольший id и последняя дата в его диапазоне; отпечатки всех
+файлов раздела считаются одним GROUP BY по номеру файла и хранятся
+в ``manifest.json`` рядом с картами. Адреса профилей и групп строятся
+не из id, а из username и slug, поэтому к их отпечатку добавляется
+хеш пар ``(id, ключ)`` файла: переименование перестраивает файл.
+"""
+import gzip
+import hashlib
+import json
+import os
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+from .models import Group, Post, User
+
+SITEMAP_XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+INDEX_NAME = "sitemap.xml"
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 2000
+PLACEHOLDER = "00000000"
+
+
+def isoformat(moment):
+    return moment.isoformat() if moment else None
+
+
+class Section:
+    def __init__(self, name, queryset, url_name, key, lastmod):
+        """Адрес строки — ``url_name`` с полем ``key``, дата — ``lastmod``."""
+        self.name = name
+        self.queryset = queryset
+        self.url_name = url_name
+        self.key = key
+        self.lastmod = lastmod
+
+    def fingerprints(self, size):
+        """``{номер файла: [строк, наибольший id, последняя дата, хеш]}``."""
+        rows = (
+            self.queryset.order_by()
+            .annotate(shard=(F("pk") - 1) / size)
+            .values("shard")
+            .annotate(
+                rows=Count("pk", distinct=True),
+                last_id=Max("pk"),
+                lastmod=Max(self.lastmod),
+            )
+        )
+        digests = self.key_digests(size)
+        return {
+            row["shard"]: [
+                row["rows"],
+                row["last_id"],
+                isoformat(row["lastmod"]),
+                digests.get(row["shard"]),
+            ]
+            for row in rows
+        }
+
+    def key_digests(self, size):
+        """Хеши пар ``(id, ключ адреса)`` по файлам; для id не нужны."""
+        if self.key == "pk":
+            return {}
+        digests = {}
+        rows = self.queryset.order_by("pk").values_list("pk", self.key)
+        for pk, key in rows.iterator(chunk_size=CHUNK_SIZE):
+            shard = (pk - 1) // size
+            if shard not in digests:
+                digests[shard] = hashlib.md5()
+            digests[shard].update(f"{pk}:{key}\n".encode())
+        return {shard: digest.hexdigest() for shard, digest in digests.items()}
+
+    def locations(self, shard, size):
+        """Пары ``(адрес, дата)`` файла ``shard`` в порядке id."""
+        # reverse() на каждую из 50 000 строк заметно дороже подстановки.
+        prefix, suffix = reverse(self.url_name, args=[PLACEHOLDER]).split(
+            PLACEHOLDER
+        )
+        start = shard * size + 1
+        rows = self.queryset.filter(
+            pk__range=(start, start + size - 1)
+        ).order_by("pk")
+        if "__" in self.lastmod:
+            rows = rows.annotate(sitemap_lastmod=Max(self.lastmod))
+            rows = rows.values_list(self.key, "sitemap_lastmod")
+        else:
+            rows = rows.values_list(self.key, self.lastmod)
+        safe = RFC3986_SUBDELIMS + "/~:@"
+        for key, lastmod in rows.iterator(chunk_size=CHUNK_SIZE):
+            yield prefix + quote(str(key), safe=safe) + suffix, lastmod
+
+
+SECTIONS = (
+    Section(
+        "posts", Post.objects.all(), "posts:post_detail", "pk", "pub_date"
+    ),
+    Section(
+        "profiles",
+        User.objects.filter(is_active=True),
+        "posts:profile",
+        "username",
+        "posts__pub_date",
+    ),
+    Section(
+        "groups",
+        Group.objects.all(),
+        "posts:group_list",
+        "slug",
+        "posts__pub_date",
+    ),
+)
+
+
+def sitemap_root():
+    return os.path.join(settings.MEDIA_ROOT, settings.SITEMAP_DIR)
+
+
+def shard_file(name):
+    return f"sitemap-{name}.xml"
+
+
+def write_xml(path, lines):
+    """Пишет ``path`` и ``path.gz`` за один проход и подменяет атомарно."""
+    with open(path + ".tmp", "wb") as plain, open(
+        path + ".gz.tmp", "wb"
+    ) as packed, gzip.GzipFile(
+        fileobj=packed, mode="wb", compresslevel=9, mtime=0
+    ) as compressed:
+        for line in lines:
+            data = line.encode()
+            plain.write(data)
+            compressed.write(data)
+    os.replace(path + ".tmp", path)
+    os.replace(path + ".gz.tmp", path + ".gz")
+
+
+def urlset(locations):
+    base = settings.SITE_URL.rstrip("/")
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<urlset xmlns="{SITEMAP_XMLNS}">\n'
+    for location, lastmod in locations:
+        line = f"<url><loc>{escape(base + location)}</loc>"
+        if lastmod:
+            line += f"<lastmod>{isoformat(lastmod)}</lastmod>"
+        yield line + "</url>\n"
+    yield "</urlset>\n"
+
+
+def sitemap_index(manifest):
+    base = settings.SITE_URL.rstrip("/")
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<sitemapindex xmlns="{SITEMAP_XMLNS}">\n'
+    for name, (_, _, lastmod, _) in manifest.items():
+        location = reverse("sitemap_shard", args=[shard_file(name)])
+        line = f"<sitemap><loc>{escape(base + location)}</loc>"
+        if lastmod:
+            line += f"<lastmod>{lastmod}</lastmod>"
+        yield line + "</sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+def generate(full=False):
+    """Перестраивает изменившиеся файлы карты; возвращает их число."""
+    root = sitemap_root()
+    os.makedirs(root, exist_ok=True)
+    size = settings.SITEMAP_SHARD_SIZE
+    previous = load_manifest(root)
+    manifest = {}
+    written = 0
+    for section in SECTIONS:
+        fingerprints = section.fingerprints(size)
+        for shard in sorted(fingerprints):
+            name = f"{section.name}-{shard}"
+            manifest[name] = fingerprints[shard]
+            path = os.path.join(root, shard_file(name))
+            unchanged = previous.get(name) == manifest[name]
+            if unchanged and not full and os.path.exists(path):
+                continue
+            write_xml(path, urlset(section.locations(shard, size)))
+            written += 1
+    index = os.path.join(root, INDEX_NAME)
+    if written or previous != manifest or not os.path.exists(index):
+        # Индекс пишется после файлов, а лишние файлы удаляются после
+        # него: индекс ссылается только на готовые карты.
+        write_xml(index, sitemap_index(manifest))
+        manifest_path = os.path.join(root, MANIFEST_NAME)
+        with open(manifest_path + ".tmp", "w") as target:
+            json.dump(manifest, target)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    for name in set(previous) - set(manifest):
+        for suffix in ("", ".gz"):
+            path = os.path.join(root, shard_file(name) + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+    return written
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from tasks.registry import task
+
+from . import sitemaps, trending
+from .images import release_image
+from .thumbnails import generate_thumbnails
+
+
+@task(max_attempts=3)
+def build_post_thumbnails(name, size=None):
+    generate_thumbnails(name, size)
+
+
+@task
+def release_post_image(name):
+    release_image(name)
+
+
+@task
+def record_activity(event, counts):
+    """``counts`` — пары ``[post_id, число]``: ключи JSON только строки."""
+    trending.record(event, dict(counts))
+
+
+@task(every=timedelta(minutes=5))
+def refresh_trending():
+    trending.refresh()
+
+
+@task(every=timedelta(hours=1))
+def generate_sitemaps():
+    sitemaps.generate()
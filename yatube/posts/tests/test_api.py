@@ -0,0 +1,107 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class PostApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.reader = User.objects.create_user("reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f"Пост {i}",
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=cls.posts[0], author=cls.reader, text=f"К {i}")
+            for i in range(3)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f"posts:{name}", args=args), params)
+
+    def test_cursor_walks_the_whole_feed(self):
+        ids = []
+        params = {"limit": 2, "fields": "id"}
+        while True:
+            with self.assertNumQueries(1):
+                data = self.get("api_index", **params).json()
+            ids.extend(item["id"] for item in data["results"])
+            if not data["next"]:
+                break
+            params["cursor"] = data["next"]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fieldsets(self):
+        data = self.get("api_index", fields="id,author,image").json()
+        self.assertEqual(
+            data["results"][0],
+            {"id": self.posts[-1].pk, "author": "author", "image": None},
+        )
+        response = self.get("api_index", fields="id,password")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["detail"])
+
+    def test_group_profile_and_detail(self):
+        data = self.get("api_group_posts", "group", fields="group").json()
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(self.get("api_group_posts", "nope").status_code, 404)
+        data = self.get("api_profile", "reader").json()
+        self.assertEqual(data["results"], [])
+        data = self.get("api_post_detail", self.posts[0].pk).json()
+        self.assertEqual(data["text"], "Пост 0")
+        self.assertIsNone(data["group"])
+        self.assertEqual(self.get("api_post_detail", 0).status_code, 404)
+
+    def test_comments_page_oldest_first(self):
+        data = self.get(
+            "api_post_comments", self.posts[0].pk, limit=2, fields="text"
+        ).json()
+        self.assertEqual(data["results"], [{"text": "К 0"}, {"text": "К 1"}])
+        data = self.get(
+            "api_post_comments", self.posts[0].pk, cursor=data["next"]
+        ).json()
+        self.assertEqual([item["text"] for item in data["results"]], ["К 2"])
+        for cursor in ("x", "9" * 30 + "-1"):
+            with self.subTest(cursor=cursor):
+                response = self.get(
+                    "api_post_comments", self.posts[0].pk, cursor=cursor
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["detail"], "Неверный курсор")
+        response = self.get("api_index", cursor="9" * 30 + "-1")
+        self.assertEqual(response.status_code, 400)
+
+    def test_follow_feed_is_private(self):
+        self.assertEqual(self.get("api_follow_posts").status_code, 403)
+        self.client.force_login(self.reader)
+        response = self.get("api_follow_posts")
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+    def test_etag_gives_not_modified(self):
+        response = self.get("api_index")
+        self.assertIn("public", response["Cache-Control"])
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse("posts:api_index"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        Post.objects.create(text="Новый", author=self.author)
+        response = self.client.get(
+            reverse("posts:api_index"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse("posts:api_index"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.signals import request_finished
+from django.contrib.admin import site
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..counters import ViewCounter, view_count, view_counter
+from ..models import Post, User
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.posts = Post.objects.bulk_create(
+            Post(text=f"text {i}", author=cls.user) for i in range(3)
+        )
+
+    def setUp(self):
+        self.posts = list(Post.objects.order_by("pk"))
+        self.counter = ViewCounter()
+
+    def test_increments_stay_in_memory_until_flush(self):
+        with self.assertNumQueries(0):
+            for post in self.posts:
+                self.counter.increment(post.pk)
+            self.counter.increment(self.posts[0].pk)
+        self.assertEqual(self.counter.pending(self.posts[0].pk), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.counter.flush(), 3)
+        self.assertEqual(
+            list(Post.objects.order_by("pk").values_list("views", flat=True)),
+            [2, 1, 1],
+        )
+        self.assertEqual(self.counter.pending(self.posts[0].pk), 0)
+
+    @override_settings(VIEW_COUNTER_BATCH=2)
+    def test_flush_writes_one_update_per_batch(self):
+        for post in self.posts:
+            self.counter.increment(post.pk)
+        with self.assertNumQueries(2):
+            self.counter.flush()
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    def test_flush_waits_until_due(self):
+        self.counter.increment(self.posts[0].pk)
+        self.assertEqual(self.counter.flush(force=False), 0)
+        with override_settings(VIEW_COUNTER_MAX_PENDING=1):
+            self.assertEqual(self.counter.flush(force=False), 1)
+
+    def test_failed_flush_keeps_counts(self):
+        self.counter.increment(self.posts[0].pk, 5)
+        with mock.patch(
+            "posts.counters.write_batch", side_effect=RuntimeError
+        ), self.assertLogs("posts.counters", "ERROR"):
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending(self.posts[0].pk), 5)
+        self.counter.flush()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).views, 5)
+
+    def test_post_detail_shows_persisted_and_pending_views(self):
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(views=10)
+        view_counter.take()
+        with mock.patch("posts.signals.view_counter.flush"):
+            response = self.client.get(
+                reverse("posts:post_detail", args=(post.pk,))
+            )
+        self.assertEqual(response.context["post"].view_count, 11)
+        self.assertContains(response, "Просмотров: 11")
+        post.refresh_from_db()
+        self.assertEqual(view_count(post), 11)
+        view_counter.flush()
+        post.refresh_from_db()
+        self.assertEqual((post.views, view_count(post)), (11, 11))
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0)
+    @mock.patch("posts.signals.close_old_connections")
+    def test_flush_closes_the_connection_it_opened(self, close):
+        view_counter.take()
+        with mock.patch.object(view_counter, "is_due", return_value=False):
+            view_counter.increment(self.posts[0].pk)
+            request_finished.send(sender=self.__class__)
+        close.assert_not_called()
+        request_finished.send(sender=self.__class__)
+        close.assert_called_once_with()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).views, 1)
+
+    def test_admin_save_keeps_views(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        Post.objects.filter(pk=post.pk).update(views=5)
+        post.text = "Исправленный текст"
+        request = RequestFactory().post("/")
+        PostAdmin(Post, site).save_model(request, post, None, True)
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.views), ("Исправленный текст", 5))
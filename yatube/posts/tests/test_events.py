@@ -0,0 +1,107 @@
+import json
+import threading
+from http import HTTPStatus as status
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..events import Broker, broker, stream_events
+from ..models import Follow, Post, User
+
+
+def parse_event(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+@override_settings(POST_EVENTS_POLL_INTERVAL=0.01, POST_EVENTS_BATCH=2)
+class PostEventsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.author = User.objects.create_user("Author")
+        cls.other = User.objects.create_user("Other")
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.first = Post.objects.create(text="first", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_stream_sends_new_posts_and_keepalive(self):
+        stream = stream_events(self.first.pk)
+        self.assertEqual(next(stream), "retry: 3000\n\n")
+        self.assertEqual(next(stream), ": keepalive\n\n")
+        posts = [
+            Post.objects.create(text=f"new {i}", author=self.author)
+            for i in range(3)
+        ]
+        events = [parse_event(next(stream)) for _ in posts]
+        self.assertEqual(
+            [int(event["id"]) for event in events],
+            [post.pk for post in posts],
+        )
+        self.assertEqual(events[0]["event"], "post")
+        self.assertEqual(events[0]["data"]["author"], "Author")
+        self.assertIn("new 0", events[0]["data"]["html"])
+        self.assertEqual(next(stream), ": keepalive\n\n")
+
+    def test_follow_stream_skips_other_authors(self):
+        stream = stream_events(self.first.pk, {self.author.pk})
+        next(stream)
+        Post.objects.create(text="other", author=self.other)
+        post = Post.objects.create(text="followed", author=self.author)
+        self.assertEqual(int(parse_event(next(stream))["id"]), post.pk)
+
+    def test_view_resumes_from_last_event_id(self):
+        post = Post.objects.create(text="missed", author=self.author)
+        response = self.authorized_client.get(
+            reverse("posts:post_events"),
+            {"feed": "follow"},
+            HTTP_LAST_EVENT_ID=str(self.first.pk),
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        stream = iter(response.streaming_content)
+        next(stream)
+        event = parse_event(next(stream).decode())
+        self.assertEqual(int(event["id"]), post.pk)
+        response.close()
+
+    def test_view_rejects_bad_requests(self):
+        url = reverse("posts:post_events")
+        self.assertEqual(
+            Client().get(url, {"feed": "follow"}).status_code,
+            status.FORBIDDEN,
+        )
+        self.assertEqual(
+            Client().get(url, {"feed": "nope"}).status_code,
+            status.BAD_REQUEST,
+        )
+
+    @mock.patch(
+        "posts.signals.transaction.on_commit", side_effect=lambda func: func()
+    )
+    def test_new_post_is_published(self, on_commit):
+        post = Post.objects.create(text="published", author=self.author)
+        self.assertEqual(broker.latest, post.pk)
+        with mock.patch.object(broker, "publish") as publish:
+            post.save()
+        publish.assert_not_called()
+
+    def test_broker_wakes_waiting_threads(self):
+        local = Broker()
+        result = []
+        waiter = threading.Thread(
+            target=lambda: result.append(local.wait(0, timeout=5))
+        )
+        waiter.start()
+        local.publish(7)
+        waiter.join(1)
+        self.assertEqual(result, [7])
+        self.assertEqual(local.wait(7, timeout=0), 7)
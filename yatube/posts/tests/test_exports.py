@@ -0,0 +1,74 @@
+import csv
+import json
+from http import HTTPStatus as status
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.fiend_user = User.objects.create_user("AnotherOne")
+        cls.posts = Post.objects.bulk_create(
+            Post(text=f"text {i}", author=cls.user) for i in range(3)
+        )
+        cls.post = Post.objects.latest("id")
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text="comment_text"
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.fiend_authorized_client = Client()
+        self.fiend_authorized_client.force_login(self.fiend_user)
+
+    def get_export(self, client, export_format):
+        return client.get(
+            reverse("posts:profile_export", args=(self.user,)),
+            {"format": export_format},
+        )
+
+    def test_export_jsonl_is_streamed(self):
+        response = self.get_export(self.authorized_client, "jsonl")
+        self.assertEqual(response.status_code, status.OK)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [row["type"] for row in rows], ["post"] * 3 + ["comment"]
+        )
+        self.assertEqual(rows[-1]["text"], self.comment.text)
+        self.assertEqual(rows[-1]["post_id"], self.post.id)
+
+    def test_export_csv(self):
+        response = self.get_export(self.authorized_client, "csv")
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["text"], "text 0")
+
+    def test_export_is_available_only_to_author(self):
+        response = self.get_export(self.fiend_authorized_client, "jsonl")
+        self.assertRedirects(
+            response, reverse("posts:profile", args=(self.user,))
+        )
+
+    def test_export_unknown_format(self):
+        response = self.get_export(self.authorized_client, "xml")
+        self.assertEqual(response.status_code, status.BAD_REQUEST)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command("export_author", self.user.username, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
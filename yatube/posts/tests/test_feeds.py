@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..feeds import CachedFeed, feed_version_key
+from ..models import Group, Post, User
+
+
+@mock.patch("posts.signals.transaction.on_commit", lambda func: func())
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.group = Group.objects.create(
+            title="Котики", slug="cats", description="Про котиков"
+        )
+        cls.other = Group.objects.create(
+            title="Собаки", slug="dogs", description="Про собак"
+        )
+        cls.post = Post.objects.create(
+            text="Первый пост\nтекст", author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_render_posts(self):
+        urls = {
+            reverse("posts:index_rss"): "application/rss+xml",
+            reverse("posts:index_atom"): "application/atom+xml",
+            reverse("posts:group_rss", args=["cats"]): "application/rss+xml",
+            reverse("posts:group_atom", args=["cats"]): "application/atom",
+            reverse("posts:profile_rss", args=["author"]): "rss",
+            reverse("posts:profile_atom", args=["author"]): "atom",
+        }
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(content_type, response["Content-Type"])
+                self.assertContains(response, "Первый пост")
+                self.assertIn("public", response["Cache-Control"])
+        response = self.client.get(reverse("posts:group_rss", args=["x"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_feed_costs_no_queries_and_supports_304(self):
+        url = reverse("posts:index_atom")
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+        url = reverse("posts:group_rss", args=["cats"])
+        self.client.get(url)
+        # Остаётся только перевести slug в id.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "mirror.example.com"])
+    def test_cache_keeps_feeds_per_host(self):
+        url = reverse("posts:index_rss")
+        self.client.get(url)
+        response = self.client.get(url, HTTP_HOST="mirror.example.com")
+        self.assertContains(response, "http://mirror.example.com/")
+        self.assertNotContains(response, "http://testserver/")
+        response = self.client.get(url, secure=True)
+        self.assertContains(response, "https://testserver/")
+
+    def test_post_events_cost_no_extra_queries(self):
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(1):
+            post.save(update_fields=["text"])
+        # Выборка поста и удаление его комментариев и самого поста.
+        with self.assertNumQueries(3):
+            Post.objects.filter(pk=post.pk).delete()
+        writer = User.objects.create_user("writer")
+        Post.objects.bulk_create(
+            Post(text=f"Пост {i}", author=writer, group=self.group)
+            for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as context:
+            writer.delete()
+        lookups = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT")
+            and ('FROM "auth_user"' in query["sql"]
+                 or 'FROM "posts_group"' in query["sql"])
+        ]
+        self.assertEqual(lookups, [])
+
+    def test_post_events_invalidate_feeds(self):
+        cats = reverse("posts:group_rss", args=["cats"])
+        dogs = reverse("posts:group_rss", args=["dogs"])
+        index = reverse("posts:index_rss")
+        for url in (cats, dogs, index):
+            self.client.get(url)
+        self.post.text = "Переписанный пост"
+        self.post.group = self.other
+        self.post.save()
+        self.assertNotContains(self.client.get(cats), "Переписанный")
+        self.assertContains(self.client.get(dogs), "Переписанный")
+        self.assertContains(self.client.get(index), "Переписанный")
+        self.post.delete()
+        self.assertNotContains(self.client.get(dogs), "Переписанный")
+
+    def test_evicted_version_does_not_bring_back_old_feed(self):
+        url = reverse("posts:index_rss")
+        self.client.get(url)
+        cache.delete(feed_version_key("index"))
+        Post.objects.create(text="Свежий пост", author=self.author)
+        self.assertContains(self.client.get(url), "Свежий пост")
+        cache.delete(feed_version_key("index"))
+        self.assertContains(self.client.get(url), "Свежий пост")
+
+    def test_cached_feed_is_abstract(self):
+        with self.assertRaises(TypeError):
+            CachedFeed()
@@ -0,0 +1,162 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..follow_index import (
+    FOLLOW_INDEX_EVENT_KEY,
+    FOLLOW_INDEX_SEQ_KEY,
+    FollowIndex,
+    follow_graph,
+)
+from ..models import Follow, User
+
+
+class FollowIndexTests(TestCase):
+    def setUp(self):
+        self.index = FollowIndex([(1, 2), (1, 3), (2, 3), (3, 1), (4, 3)])
+
+    def test_degree_and_membership(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.following_count(1), 2)
+        self.assertEqual(self.index.followers_count(3), 3)
+        self.assertEqual(self.index.followers_count(5), 0)
+        self.assertTrue(self.index.follows(1, 3))
+        self.assertFalse(self.index.follows(3, 2))
+        self.assertTrue(self.index.is_mutual(1, 3))
+        self.assertFalse(self.index.is_mutual(1, 2))
+
+    def test_deltas_change_answers_without_rebuild(self):
+        self.index.follow(3, 2)
+        self.index.unfollow(1, 3)
+        self.index.follow(1, 2)
+        self.index.unfollow(5, 1)
+        self.assertEqual(self.index.pending, 2)
+        self.assertTrue(self.index.follows(3, 2))
+        self.assertFalse(self.index.follows(1, 3))
+        self.assertEqual(self.index.following_count(1), 1)
+        self.assertEqual(self.index.followers_count(3), 2)
+        self.assertEqual(self.index.follower_ids(2), {1, 3})
+        self.index.follow(1, 3)
+        self.index.unfollow(3, 2)
+        self.assertEqual(self.index.pending, 0)
+
+    def test_compact_merges_deltas(self):
+        self.index.follow(3, 2)
+        self.index.unfollow(1, 3)
+        compacted = self.index.compact()
+        self.assertEqual(compacted.pending, 0)
+        self.assertEqual(
+            sorted(compacted.following.pairs()),
+            [(1, 2), (2, 3), (3, 1), (3, 2), (4, 3)],
+        )
+        self.assertEqual(compacted.followers_count(2), 2)
+
+    def test_followed_by_followees(self):
+        # На 3 подписаны 1, 2 и 4; сам 1 подписан на 2 и 3.
+        self.assertEqual(self.index.followed_by_followees(1, 3), [2])
+        self.index.follow(1, 4)
+        self.assertEqual(self.index.followed_by_followees(1, 3), [2, 4])
+        self.assertEqual(self.index.followed_by_followees(1, 3, 1), [2])
+
+    def test_memory_is_reported_per_edge(self):
+        # Два среза по 8 байт на ребро, id и границы срезов вершин.
+        self.assertEqual(self.index.nbytes, 5 * 8 * 2 + (4 + 5 + 3 + 4) * 8)
+        self.assertEqual(self.index.bytes_per_edge, self.index.nbytes / 5)
+
+
+@override_settings(FOLLOW_INDEX_SYNC_INTERVAL=0)
+class SharedFollowIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader")
+        cls.author = User.objects.create_user("author")
+        cls.friend = User.objects.create_user("friend")
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.reset()
+        self.addCleanup(follow_graph.reset)
+        on_commit = mock.patch(
+            "posts.signals.transaction.on_commit", side_effect=lambda f: f()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+
+    def test_loads_once_and_answers_without_queries(self):
+        with self.assertNumQueries(1):
+            index = follow_graph.get()
+        with self.assertNumQueries(0):
+            self.assertIs(follow_graph.get(), index)
+            self.assertTrue(index.follows(self.user.pk, self.friend.pk))
+            self.assertEqual(index.followers_count(self.author.pk), 1)
+
+    def test_follow_and_unfollow_are_applied_as_deltas(self):
+        index = follow_graph.get()
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        with self.assertNumQueries(0):
+            self.assertIs(follow_graph.get(), index)
+        self.assertTrue(index.follows(self.user.pk, self.author.pk))
+        follow.delete()
+        self.assertFalse(follow_graph.get().follows(
+            self.user.pk, self.author.pk
+        ))
+
+    def test_events_from_other_processes_are_read_from_cache(self):
+        index = follow_graph.get()
+        cache.set(FOLLOW_INDEX_SEQ_KEY, 1)
+        cache.set(
+            FOLLOW_INDEX_EVENT_KEY.format(1),
+            ("follow", self.author.pk, self.user.pk),
+        )
+        self.assertTrue(follow_graph.get().follows(
+            self.author.pk, self.user.pk
+        ))
+        self.assertIs(follow_graph.get(), index)
+
+    def test_lost_event_reloads_from_database(self):
+        index = follow_graph.get()
+        cache.set(FOLLOW_INDEX_SEQ_KEY, 1)
+        self.assertIs(follow_graph.get(), index)
+        with self.assertNumQueries(1):
+            self.assertIsNot(follow_graph.get(), index)
+
+    def test_profile_uses_index(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("posts:profile", args=[self.author.username])
+        )
+        self.assertFalse(response.context["following"])
+        self.assertEqual(response.context["followers_count"], 1)
+        self.assertEqual(list(response.context["followed_by"]), [self.friend])
+        self.client.get(
+            reverse("posts:profile_follow", args=[self.author.username])
+        )
+        response = self.client.get(
+            reverse("posts:profile", args=[self.author.username])
+        )
+        self.assertTrue(response.context["following"])
+        self.assertEqual(response.context["followers_count"], 2)
+
+    def test_profile_button_ignores_stale_index(self):
+        self.client.force_login(self.user)
+        url = reverse("posts:profile", args=[self.author.username])
+        self.client.get(url)
+        # Подписка из другого процесса, до которой индекс ещё не дошёл.
+        with mock.patch("posts.signals.transaction.on_commit"):
+            Follow.objects.create(user=self.user, author=self.author)
+            Follow.objects.create(user=self.author, author=self.user)
+        response = self.client.get(url)
+        self.assertTrue(response.context["following"])
+        self.assertTrue(response.context["follows_you"])
+
+    def test_stats_command_reports_memory_per_edge(self):
+        out = StringIO()
+        call_command("follow_index_stats", queries=10, stdout=out)
+        self.assertIn("Индекс: 2 подписок", out.getvalue())
+        self.assertIn("байт на ребро", out.getvalue())
@@ -123,7 +123,10 @@ class FormsTests(TestCase):
         self.assertEqual(response.status_code, status.FOUND)
         post = Post.objects.latest("id")
         self.assertEqual(post.text, form_data["text"])
-        self.assertEqual(post.image, "posts/small.gif")
+        self.assertRegex(
+            post.image.name,
+            r"^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$",
+        )
 
     def test_authorized_can_comment(self):
         response = self.authorized_client.post(
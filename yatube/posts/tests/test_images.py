@@ -0,0 +1,177 @@
+import os
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import release_image
+from ..models import Post, User
+from .utils import TempMediaMixin
+
+
+def image_upload(name, size, image_format, **save_options):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=(200, 0, 0)).save(
+        buffer, image_format, **save_options
+    )
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def exif_with_orientation(orientation):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "TestCamera"
+    return exif.tobytes()
+
+
+@override_settings(
+    POST_IMAGE_MAX_SIDE=100,
+    POST_IMAGE_MAX_PIXELS=1_000_000,
+)
+class ImageUploadTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, upload):
+        return self.authorized_client.post(
+            reverse("posts:post_create"), {"text": "text", "image": upload}
+        )
+
+    def test_oversize_image_is_downscaled(self):
+        self.create_post(image_upload("big.jpg", (400, 200), "JPEG"))
+        post = Post.objects.latest("id")
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, "JPEG")
+
+    def test_oversize_animation_keeps_every_frame(self):
+        buffer = BytesIO()
+        frames = [
+            Image.new("RGB", (300, 150), color)
+            for color in ((200, 0, 0), (0, 200, 0), (0, 0, 200))
+        ]
+        frames[0].save(
+            buffer,
+            "GIF",
+            save_all=True,
+            append_images=frames[1:],
+            duration=[50, 80, 120],
+            loop=0,
+        )
+        self.create_post(SimpleUploadedFile("cat.gif", buffer.getvalue()))
+        post = Post.objects.latest("id")
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.n_frames, 3)
+            durations = []
+            for index in range(image.n_frames):
+                image.seek(index)
+                durations.append(image.info["duration"])
+                self.assertEqual(
+                    image.convert("RGB").getpixel((50, 25)),
+                    frames[index].getpixel((0, 0)),
+                )
+        self.assertEqual(durations, [50, 80, 120])
+
+    def test_exif_is_stripped_and_orientation_applied(self):
+        self.create_post(
+            image_upload(
+                "photo.jpg",
+                (80, 40),
+                "JPEG",
+                exif=exif_with_orientation(6),
+            )
+        )
+        post = Post.objects.latest("id")
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (40, 80))
+            self.assertFalse(image.getexif())
+
+    def test_too_many_pixels_are_rejected(self):
+        form = PostForm(
+            data={"text": "text"},
+            files={
+                "image": image_upload("huge.png", (2000, 1000), "PNG")
+            },
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("image", form.errors)
+
+    def test_dimensions_and_placeholder_are_stored(self):
+        self.create_post(
+            image_upload(
+                "photo.jpg", (60, 30), "JPEG", exif=exif_with_orientation(6)
+            )
+        )
+        post = Post.objects.latest("id")
+        self.assertEqual((post.image_width, post.image_height), (30, 60))
+        self.assertTrue(
+            post.image_placeholder.startswith("data:image/jpeg;base64,")
+        )
+        self.assertLess(len(post.image_placeholder), 1024)
+
+    def test_small_image_is_stored_as_is(self):
+        upload = image_upload("small.png", (10, 10), "PNG")
+        content = upload.read()
+        upload.seek(0)
+        self.create_post(upload)
+        post = Post.objects.latest("id")
+        with open(post.image.path, "rb") as stored:
+            self.assertEqual(stored.read(), content)
+
+
+@override_settings(POST_IMAGE_RELEASE_GRACE=0)
+class ImageReleaseTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+
+    def create_post(self):
+        return Post.objects.create(
+            text="text",
+            author=self.user,
+            image=image_upload("same.png", (10, 10), "PNG"),
+        )
+
+    def test_shared_image_is_kept_until_last_reference(self):
+        first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        path = first.image.path
+        first.delete()
+        release_image(first.image.name)
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        release_image(second.image.name)
+        self.assertFalse(os.path.exists(path))
+
+    def test_freshly_reused_image_is_kept(self):
+        post = self.create_post()
+        post.delete()
+        # Та же картинка только что выдана новой загрузке, а пост с ней
+        # ещё не записан в базу.
+        with override_settings(POST_IMAGE_RELEASE_GRACE=60):
+            release_image(post.image.name)
+        self.assertTrue(os.path.exists(post.image.path))
+
+    @mock.patch(
+        "tasks.registry.transaction.on_commit", side_effect=lambda func: func()
+    )
+    def test_replaced_image_is_released(self, on_commit):
+        post = self.create_post()
+        path = post.image.path
+        post = Post.objects.get(pk=post.pk)
+        post.image = image_upload("new.png", (20, 10), "PNG")
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
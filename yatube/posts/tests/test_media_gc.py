@@ -0,0 +1,113 @@
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..media_gc import orphaned_images
+from ..models import Post, User
+from ..thumbnails import generate_thumbnails
+from .utils import SMALL_GIF, TempMediaMixin
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+class CollectMediaGarbageTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text="text",
+            author=self.user,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        generate_thumbnails(self.post.image.name)
+        storage = self.post.image.storage
+        self.orphan = storage.save("posts/orphan.gif", ContentFile(b"gif"))
+        self.stray_thumbnail = storage.save(
+            "cache/ab/cd/stray.jpg", ContentFile(b"jpeg")
+        )
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command(
+            "collect_media_garbage", "--min-age=0", "--sleep=0", *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def media_files(self):
+        return {
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root)
+            for name in names
+        }
+
+    def test_dry_run_reports_reclaimable_bytes(self):
+        files = self.media_files()
+        output = self.collect("--dry-run")
+        self.assertIn("картинки: 1 файлов, 3 байт", output)
+        self.assertIn("миниатюры: 1 файлов, 4 байт", output)
+        self.assertEqual(self.media_files(), files)
+
+    def test_dry_run_counts_thumbnails_of_orphaned_images(self):
+        thumbnails = {
+            name for name in self.media_files()
+            if name.startswith("cache/") and name != self.stray_thumbnail
+        }
+        self.assertTrue(thumbnails)
+        thumbnail_bytes = sum(
+            os.path.getsize(os.path.join(self.media_root, name))
+            for name in thumbnails
+        )
+        Post.objects.filter(pk=self.post.pk).update(image="")
+        report = f"{len(thumbnails) + 1} файлов, {thumbnail_bytes + 4} байт"
+        self.assertIn(f"Будет удалено миниатюры: {report}",
+                      self.collect("--dry-run"))
+        self.assertIn(f"Удалено миниатюры: {report}", self.collect())
+        self.assertFalse(thumbnails & self.media_files())
+
+    def test_reused_file_is_young_again(self):
+        path = os.path.join(self.media_root, self.orphan)
+        os.utime(path, (0, 0))
+        self.post.image.storage.save("posts/again.gif", ContentFile(b"gif"))
+        out = StringIO()
+        call_command(
+            "collect_media_garbage", "--min-age=3600", "--sleep=0",
+            stdout=out,
+        )
+        self.assertTrue(os.path.exists(path))
+
+    def test_image_attached_after_scan_is_kept(self):
+        def scan_then_attach(batch_size, min_age):
+            batches = list(orphaned_images(batch_size, min_age))
+            # Пока сборщик шёл по файлам, ту же картинку загрузили снова.
+            Post.objects.create(
+                text="again", author=self.user, image=self.orphan
+            )
+            return batches
+
+        with mock.patch(
+            "posts.management.commands.collect_media_garbage."
+            "orphaned_images",
+            scan_then_attach,
+        ):
+            output = self.collect()
+        self.assertIn(self.orphan, self.media_files())
+        self.assertIn("Удалено картинки: 0 файлов, 0 байт", output)
+
+    def test_orphans_are_deleted_and_live_files_kept(self):
+        files = self.media_files()
+        self.collect()
+        self.assertEqual(
+            self.media_files(),
+            files - {self.orphan, self.stray_thumbnail},
+        )
+        self.assertIn(self.post.image.name, self.media_files())
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from sorl.thumbnail import default
+
+from ..models import Post, User
+from ..thumbnails import attach_thumbnails, image_file, thumbnail_variants
+from .utils import SMALL_GIF, TempMediaMixin
+
+
+class RebuildThumbnailsTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.posts = [
+            Post.objects.create(
+                text=f"text {i}",
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    f"small{i}.gif", SMALL_GIF + bytes([i]), "image/gif"
+                ),
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command("rebuild_thumbnails", *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def assert_registered(self, post):
+        keys = default.kvstore._get(
+            image_file(post.image.name).key, identity="thumbnails"
+        )
+        self.assertEqual(len(keys), len(list(thumbnail_variants("card"))))
+        attach_thumbnails([post])
+        self.assertTrue(post.thumbnail.exists())
+        self.assertEqual(post.thumbnail.size, [960, 339])
+
+    def test_rebuild_in_process_pool(self):
+        output = self.rebuild("--workers=2")
+        self.assertIn("3/3", output)
+        for post in self.posts:
+            with self.subTest(post=post.text):
+                self.assert_registered(post)
+
+    def test_rebuild_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            with open(checkpoint, "w") as file:
+                json.dump({"last_pk": self.posts[1].pk}, file)
+            output = self.rebuild(
+                "--workers=0", "--batch-size=1", f"--checkpoint={checkpoint}"
+            )
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertIn("1/1", output)
+        self.assert_registered(self.posts[2])
+        self.assertIsNone(
+            default.kvstore._get(
+                image_file(self.posts[0].image.name).key,
+                identity="thumbnails",
+            )
+        )
@@ -0,0 +1,91 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, User
+from ..recommendations import (
+    FollowGraph,
+    follow_suggestions,
+    synthetic_graph,
+)
+
+
+class FollowGraphTests(TestCase):
+    def graph(self, edges):
+        src, dst = zip(*edges)
+        return FollowGraph(np.array(src), np.array(dst))
+
+    def test_friends_of_friends_are_ranked(self):
+        graph = self.graph([
+            (10, 20), (10, 30),
+            (20, 40), (30, 40), (20, 50), (30, 10), (20, 30),
+            (60, 50), (70, 50),
+        ])
+        user = np.searchsorted(graph.ids, 10)
+        rows, candidates, scores, ranks = graph.suggest(np.array([user]))
+        self.assertEqual(graph.ids[candidates].tolist(), [40, 50])
+        self.assertEqual(scores.tolist(), [2, 1])
+        self.assertEqual(ranks.tolist(), [0, 1])
+        self.assertEqual(graph.ids[graph.popular(2)].tolist(), [50, 30])
+
+    def test_chunks_cover_every_user_within_budget(self):
+        graph = synthetic_graph(5000, seed=1)
+        chunks = list(graph.chunks(max_pairs=2000))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(
+            np.concatenate(chunks).tolist(), list(range(graph.size))
+        )
+        whole = graph.suggest(np.arange(graph.size), 3)
+        parts = [graph.suggest(rows, 3) for rows in chunks]
+        for whole_part, chunked in zip(whole, zip(*parts)):
+            self.assertEqual(
+                whole_part.tolist(), np.concatenate(chunked).tolist()
+            )
+
+
+class SuggestFollowsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.friend, cls.star, cls.loner = (
+            User.objects.create_user(name)
+            for name in ("reader", "friend", "star", "loner")
+        )
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.star)
+
+    def test_suggestions_are_stored_and_looked_up(self):
+        out = StringIO()
+        call_command("suggest_follows", stdout=out)
+        self.assertIn("Рекомендации: 3 строк", out.getvalue())
+        self.assertEqual(follow_suggestions(self.reader), [self.star])
+        # Без подписок — самые читаемые авторы, кроме себя.
+        self.assertEqual(
+            follow_suggestions(self.loner), [self.friend, self.star]
+        )
+        self.assertEqual(follow_suggestions(self.star), [self.friend])
+
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.assertEqual(follow_suggestions(self.reader), [])
+
+        self.client.force_login(self.loner)
+        response = self.client.get(reverse("posts:follow_index"))
+        self.assertEqual(
+            response.context["suggestions"], [self.friend, self.star]
+        )
+        self.assertContains(response, "Кого почитать")
+
+    def test_rerun_replaces_previous_generation(self):
+        call_command("suggest_follows", stdout=StringIO())
+        Follow.objects.all().delete()
+        call_command("suggest_follows", stdout=StringIO())
+        self.assertFalse(FollowSuggestion.objects.exists())
+
+    def test_benchmark_does_not_touch_database(self):
+        out = StringIO()
+        with self.assertNumQueries(0):
+            call_command("suggest_follows", benchmark=2000, stdout=out)
+        self.assertIn("пользователей в секунду", out.getvalue())
@@ -0,0 +1,132 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..sitemaps import generate, sitemap_root
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    SITEMAP_SHARD_SIZE=2,
+    SITE_URL="https://yatube.example",
+)
+class SitemapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(text=f"Пост {i}", author=cls.author)
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def read(self, name):
+        with open(os.path.join(sitemap_root(), name)) as source:
+            return source.read()
+
+    def post_shards(self):
+        # Файлы режутся по id: номер файла — (id - 1) // 2.
+        ids = Post.objects.values_list("pk", flat=True)
+        return sorted({(pk - 1) // 2 for pk in ids})
+
+    def test_shards_and_index(self):
+        written = generate()
+        shards = self.post_shards()
+        self.assertEqual(written, len(shards) + 2)
+        for shard in shards:
+            content = self.read(f"sitemap-posts-{shard}.xml")
+            self.assertLessEqual(content.count("<url>"), 2)
+            with gzip.open(os.path.join(
+                sitemap_root(), f"sitemap-posts-{shard}.xml.gz"
+            ), "rt") as packed:
+                self.assertEqual(packed.read(), content)
+        urls = "".join(
+            self.read(f"sitemap-posts-{shard}.xml") for shard in shards
+        )
+        for post in self.posts:
+            self.assertIn(
+                f"https://yatube.example/posts/{post.pk}/</loc>", urls
+            )
+        index = self.read("sitemap.xml")
+        self.assertEqual(index.count("<sitemap>"), len(shards) + 2)
+        self.assertIn(
+            "https://yatube.example/sitemaps/sitemap-groups-", index
+        )
+        self.assertIn("/profile/author/", self.read(
+            f"sitemap-profiles-{(self.author.pk - 1) // 2}.xml"
+        ))
+
+    def test_only_changed_shards_are_rewritten(self):
+        generate()
+        self.assertEqual(generate(), 0)
+        post = Post.objects.create(text="Новый", author=self.author)
+        # Меняются файл с новым постом и файл профиля автора.
+        self.assertEqual(generate(), 2)
+        self.assertIn(
+            f"/posts/{post.pk}/",
+            self.read(f"sitemap-posts-{(post.pk - 1) // 2}.xml"),
+        )
+        self.assertEqual(generate(full=True), len(self.post_shards()) + 2)
+
+    def test_removed_shards_are_deleted(self):
+        generate()
+        shard = (self.group.pk - 1) // 2
+        path = os.path.join(sitemap_root(), f"sitemap-groups-{shard}.xml")
+        self.assertTrue(os.path.exists(path))
+        self.group.delete()
+        generate()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(path + ".gz"))
+        self.assertNotIn("sitemap-groups-", self.read("sitemap.xml"))
+
+    def test_served_precompressed(self):
+        generate()
+        url = reverse("sitemap")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("application/xml", response["Content-Type"])
+        self.assertIn("<sitemapindex", b"".join(response).decode())
+        self.assertIn("Accept-Encoding", response["Vary"])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response)).decode()
+        self.assertIn("<sitemapindex", content)
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+        for name in ("manifest.json", "sitemap-posts-0.xml.gz", "x.xml"):
+            response = self.client.get(
+                reverse("sitemap_shard", args=[name])
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_renamed_profile_and_group_are_rewritten(self):
+        generate()
+        self.author.username = "renamed"
+        self.author.save()
+        self.group.slug = "moved"
+        self.group.save()
+        self.assertEqual(generate(), 2)
+        profiles = self.read(
+            f"sitemap-profiles-{(self.author.pk - 1) // 2}.xml"
+        )
+        self.assertIn("/profile/renamed/", profiles)
+        self.assertNotIn("/profile/author/", profiles)
+        groups = self.read(f"sitemap-groups-{(self.group.pk - 1) // 2}.xml")
+        self.assertIn("/group/moved/", groups)
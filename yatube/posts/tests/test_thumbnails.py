@@ -0,0 +1,160 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+
+from tasks.models import Task
+from tasks.worker import Worker
+
+from ..models import Post, User
+from ..thumbnails import (
+    ThumbnailBackend,
+    attach_thumbnails,
+    generate_thumbnails,
+    image_file,
+    image_formats,
+    thumbnail_variants,
+)
+from .utils import SMALL_GIF, TempMediaMixin
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch(
+        "tasks.registry.transaction.on_commit", side_effect=lambda func: func()
+    )
+    def test_thumbnails_are_built_on_save(self, on_commit):
+        post = Post.objects.create(
+            text="test_text",
+            author=self.user,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        on_commit.assert_called()
+        source = image_file(post.image.name)
+        thumbnail_keys = default.kvstore._get(
+            source.key, identity="thumbnails"
+        )
+        self.assertEqual(
+            len(thumbnail_keys), len(list(thumbnail_variants("card")))
+        )
+        for key in thumbnail_keys:
+            self.assertTrue(default.kvstore._get(key).exists())
+
+    @override_settings(TASKS_EAGER=False)
+    def test_thumbnails_are_queued_for_worker(self):
+        post = Post.objects.create(
+            text="test_text",
+            author=self.user,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        post.save()
+        task = Task.objects.get(name="posts.tasks.build_post_thumbnails")
+        self.assertEqual(task.name, "posts.tasks.build_post_thumbnails")
+        self.assertEqual(task.unique_key, f"thumbnails:{post.image.name}")
+        self.assertEqual(task.load_args(), ([post.image.name, [2, 1]], {}))
+        Worker("test-worker").run_once()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertIsNotNone(
+            default.kvstore._get(
+                image_file(post.image.name).key, identity="thumbnails"
+            )
+        )
+
+    def test_known_source_size_is_registered_without_reading(self):
+        post = Post.objects.create(
+            text="test_text",
+            author=self.user,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        with mock.patch.object(default.engine, "get_image") as get_image:
+            with mock.patch("posts.thumbnails.get_thumbnail"):
+                generate_thumbnails(post.image.name, (2, 1))
+        get_image.assert_not_called()
+        source = default.kvstore.get(image_file(post.image.name))
+        self.assertEqual(source.size, [2, 1])
+
+    def test_missing_source_is_skipped(self):
+        self.assertEqual(generate_thumbnails("posts/missing.gif"), [])
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=0)
+class AttachThumbnailsTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        for i in range(3):
+            post = Post.objects.create(
+                text=f"text {i}",
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    f"small{i}.gif", SMALL_GIF, "image/gif"
+                ),
+            )
+            generate_thumbnails(post.image.name)
+        Post.objects.create(text="no image", author=cls.user)
+
+    def test_page_thumbnails_are_resolved_in_one_lookup(self):
+        posts = list(Post.objects.all())
+        with mock.patch.object(
+            default.kvstore, "_get_raw"
+        ) as get_raw, mock.patch(
+            "posts.thumbnails.get_thumbnail"
+        ) as build_thumbnail:
+            attach_thumbnails(posts)
+        get_raw.assert_not_called()
+        build_thumbnail.assert_not_called()
+        for post in posts:
+            with self.subTest(post=post.text):
+                if post.image:
+                    geometry, options = settings.POST_THUMBNAILS["card"]
+                    expected = get_thumbnail(post.image, geometry, **options)
+                    self.assertEqual(post.thumbnail.url, expected.url)
+                    self.assertEqual(post.thumbnail.size, expected.size)
+                else:
+                    self.assertIsNone(post.thumbnail)
+
+    @override_settings(
+        POST_THUMBNAIL_WIDTHS=(480, 960), POST_THUMBNAIL_FORMATS=("WEBP",)
+    )
+    def test_responsive_variants(self):
+        post = Post.objects.filter(image__gt="").first()
+        generate_thumbnails(post.image.name)
+        attach_thumbnails([post])
+        self.assertEqual(len(post.thumbnail_srcset.split(", ")), 2)
+        self.assertEqual(post.thumbnail.size, [960, 339])
+        self.assertEqual(
+            [source["type"] for source in post.thumbnail_sources],
+            ["image/webp"],
+        )
+        self.assertIn(" 480w, ", post.thumbnail_sources[0]["srcset"])
+        response = self.client.get(
+            reverse("posts:profile", args=(self.user,))
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, "url(data:image/jpeg;base64,")
+
+    def test_image_formats_end_with_jpeg_fallback(self):
+        self.assertEqual(image_formats()[-1], "JPEG")
+
+    def test_backend_names_avif_thumbnails(self):
+        name = ThumbnailBackend()._get_thumbnail_filename(
+            image_file("posts/small.gif"), "480x170", {"format": "AVIF"}
+        )
+        self.assertTrue(name.endswith(".avif"))
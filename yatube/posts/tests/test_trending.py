@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task
+
+from ..models import Comment, Group, Post, Trend, User
+from ..trending import CACHE_KEY, bump, decay, record, refresh, top
+
+
+@override_settings(
+    TRENDING_HALF_LIFE=3600,
+    TRENDING_WEIGHTS={"post": 1.0, "comment": 3.0, "view": 0.5},
+    TRENDING_MIN_SCORE=0.5,
+    TRENDING_TOP=2,
+)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.group = Group.objects.create(
+            title="Тестовая группа", slug="test-slug", description="Тест"
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f"text {i}", author=cls.user, group=cls.group
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        Trend.objects.all().delete()
+
+    def score(self, kind, object_id):
+        return Trend.objects.get(kind=kind, object_id=object_id).score
+
+    def test_score_halves_every_half_life(self):
+        now = timezone.now()
+        self.assertAlmostEqual(
+            decay(8, now - timedelta(hours=3), now), 1
+        )
+
+    def test_events_decay_old_score_and_add_weight(self):
+        first, second = self.posts[:2]
+        now = timezone.now()
+        bump({(Trend.POST, first.pk): 4}, now - timedelta(hours=1))
+        # Группы постов, рейтинги по видам, UPDATE, INSERT и точка
+        # сохранения — независимо от размера пачки.
+        with self.assertNumQueries(7):
+            record("comment", {first.pk: 1, second.pk: 2})
+        self.assertAlmostEqual(self.score(Trend.POST, first.pk), 5, 2)
+        self.assertEqual(self.score(Trend.POST, second.pk), 6)
+        self.assertEqual(self.score(Trend.GROUP, self.group.pk), 9)
+
+    def test_refresh_prunes_and_caches_top(self):
+        now = timezone.now()
+        first, second, third = self.posts
+        bump({
+            (Trend.POST, first.pk): 1,
+            (Trend.POST, second.pk): 3,
+            (Trend.POST, third.pk): 2,
+        }, now)
+        bump({(Trend.GROUP, self.group.pk): 1}, now - timedelta(hours=2))
+        self.assertEqual(
+            refresh(now),
+            {Trend.POST: [second.pk, third.pk], Trend.GROUP: []},
+        )
+        self.assertFalse(Trend.objects.filter(kind=Trend.GROUP).exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(top(Trend.POST), [second.pk, third.pk])
+
+    def test_cold_cache_queues_refresh_instead_of_scanning(self):
+        record("comment", {self.posts[1].pk: 1})
+        refresh()
+        cache.delete_many([
+            CACHE_KEY.format(kind=kind) for kind in (Trend.POST, Trend.GROUP)
+        ])
+        # Trend не читается: только вставка задачи в точке сохранения,
+        # и только на первый промах.
+        with self.assertNumQueries(3):
+            self.assertEqual(top(Trend.POST), [self.posts[1].pk])
+            self.assertEqual(top(Trend.GROUP), [self.group.pk])
+        task = Task.objects.get(unique_key="trending:refresh")
+        self.assertEqual(task.name, "posts.tasks.refresh_trending")
+        cache.clear()
+        self.assertEqual(top(Trend.POST), [])
+
+    def test_trending_page_lists_top_posts_and_groups(self):
+        record("comment", {self.posts[1].pk: 1})
+        refresh()
+        response = self.client.get(reverse("posts:trending"))
+        self.assertTemplateUsed(response, "posts/trending.html")
+        self.assertEqual(response.context["posts"], [self.posts[1]])
+        self.assertEqual(response.context["groups"], [self.group])
+
+    @override_settings(TASKS_EAGER=False)
+    def test_comment_is_queued_as_activity(self):
+        Comment.objects.create(
+            post=self.posts[0], author=self.user, text="comment"
+        )
+        task = Task.objects.get(name="posts.tasks.record_activity")
+        self.assertEqual(
+            task.load_args(), (["comment", [[self.posts[0].pk, 1]]], {})
+        )
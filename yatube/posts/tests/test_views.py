@@ -9,7 +9,8 @@ from django.core.paginator import Page
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
+from ..views import COMMENTS_COUNT
 
 
 class PostPagesTest(TestCase):
@@ -304,3 +305,47 @@ class SubscriptionViewTest(TestCase):
                 response = user.get(reverse("posts:follow_index"))
                 page_obj = response.context.get("page_obj")
                 self.assertEqual(len(page_obj), expected_result)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user("WithNoName")
+        cls.post = Post.objects.create(text="test_text", author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f"comment {i}")
+            for i in range(COMMENTS_COUNT + 5)
+        )
+        # Одинаковое время создания: порядок держится на id.
+        Comment.objects.update(created=cls.post.pub_date)
+
+    def test_comments_are_paged_by_cursor(self):
+        response = self.client.get(
+            reverse("posts:post_detail", args=(self.post.pk,))
+        )
+        comments = response.context["comments"]
+        self.assertEqual(len(comments), COMMENTS_COUNT)
+        self.assertEqual(comments[0].text, "comment 0")
+        next_cursor = response.context["next_cursor"]
+        self.assertContains(response, f"?after={next_cursor}")
+
+        url = reverse("posts:post_comments", args=(self.post.pk,))
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"after": next_cursor})
+        self.assertTemplateUsed(response, "posts/includes/comments.html")
+        self.assertEqual(
+            [comment.text for comment in response.context["comments"]],
+            [f"comment {COMMENTS_COUNT + i}" for i in range(5)],
+        )
+        self.assertIsNone(response.context["next_cursor"])
+        self.assertNotContains(response, "data-more-comments")
+
+    def test_bad_cursor_is_rejected(self):
+        url = reverse("posts:post_comments", args=(self.post.pk,))
+        for cursor in ("nope", "1-2-3", "9" * 30 + "-1"):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {"after": cursor})
+                self.assertEqual(response.status_code, 400)
+        missing = reverse("posts:post_comments", args=(self.post.pk + 1,))
+        self.assertEqual(self.client.get(missing).status_code, 404)
@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+class TempMediaMixin:
+    """Свой временный MEDIA_ROOT на класс тестов, удаляется после него."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls._media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media_override.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._remove_media_root()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._remove_media_root()
+
+    @classmethod
+    def _remove_media_root(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
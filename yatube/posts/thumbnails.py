@@ -0,0 +1,335 @@
+"""Миниатюры картинок постов: заранее в фоне и пачкой на страницу."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize, serialize, tokey
+from sorl.thumbnail.images import (
+    ImageFile,
+    deserialize_image_file,
+    serialize_image_file,
+)
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE,
+    KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    "AVIF": "image/avif",
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+}
+
+_executor = None
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl, который умеет сохранять миниатюры в AVIF."""
+
+    extensions = dict(EXTENSIONS, AVIF="avif")
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = f"{key[:2]}/{key[2:4]}/{key}"
+        extension = self.extensions[options["format"]]
+        return f"{sorl_settings.THUMBNAIL_PREFIX}{path}.{extension}"
+
+
+def image_formats():
+    """Форматы вариантов миниатюр, которые умеет сохранять Pillow.
+
+    JPEG всегда последний: это запасной вариант для ``<img>``.
+    """
+    Image.init()
+    return [
+        image_format
+        for image_format in settings.POST_THUMBNAIL_FORMATS
+        if image_format in Image.SAVE and image_format != "JPEG"
+    ] + ["JPEG"]
+
+
+def thumbnail_variants(thumbnail="card"):
+    """Варианты миниатюры: (формат, ширина, геометрия, опции)."""
+    geometry, options = settings.POST_THUMBNAILS[thumbnail]
+    width, height = map(int, geometry.split("x"))
+    widths = sorted(set(settings.POST_THUMBNAIL_WIDTHS) | {width})
+    for image_format in image_formats():
+        variant_options = dict(options)
+        if image_format != "JPEG":
+            variant_options["format"] = image_format
+        for variant_width in widths:
+            variant_height = round(height * variant_width / width)
+            yield (
+                image_format,
+                variant_width,
+                f"{variant_width}x{variant_height}",
+                variant_options,
+            )
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix="thumbnails",
+        )
+    return _executor
+
+
+def image_file(name):
+    return ImageFile(name, Post._meta.get_field("image").storage)
+
+
+def generate_thumbnails(name, size=None):
+    """Строит все варианты миниатюр ``POST_THUMBNAILS`` для ``name``.
+
+    Готовые миниатюры берутся из KV-хранилища sorl, поэтому повторный
+    вызов для той же картинки не трогает Pillow. Известный ``size``
+    картинки сразу записывается в KV-хранилище, чтобы sorl не открывал
+    исходник только ради размеров.
+    """
+    source = image_file(name)
+    if not source.exists():
+        return []
+    if size is not None:
+        source.set_size(size)
+        default.kvstore.get_or_set(source)
+    return [
+        get_thumbnail(source, geometry, **options)
+        for thumbnail in settings.POST_THUMBNAILS
+        for _, _, geometry, options in thumbnail_variants(thumbnail)
+    ]
+
+
+def _generate_safely(name, size=None):
+    try:
+        generate_thumbnails(name, size)
+    except Exception:
+        logger.exception("Не удалось построить миниатюры для %s", name)
+
+
+def _generate_in_background(name, size):
+    try:
+        _generate_safely(name, size)
+    finally:
+        with _queued_lock:
+            _queued.discard(name)
+        connections.close_all()
+
+
+def queue_thumbnails(name, size=None):
+    if not settings.POST_THUMBNAIL_WORKERS:
+        _generate_safely(name, size)
+        return
+    with _queued_lock:
+        if name in _queued:
+            return
+        _queued.add(name)
+    get_executor().submit(_generate_in_background, name, size)
+
+
+def thumbnail_options(source, options):
+    """Опции миниатюры, дополненные так же, как в ``get_thumbnail``.
+
+    От них зависит имя файла, а значит и ключ в KV-хранилище.
+    """
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(name, geometry, options):
+    """Файл миниатюры, который построил бы ``get_thumbnail``."""
+    source = image_file(name)
+    options = thumbnail_options(source, options)
+    return ImageFile(
+        default.backend._get_thumbnail_filename(source, geometry, options),
+        default.storage,
+    )
+
+
+def build_thumbnails(name, force=False):
+    """Строит все варианты миниатюр, декодируя исходник один раз.
+
+    Не обращается ни к базе, ни к KV-хранилищу, поэтому годится для
+    дочерних процессов. Возвращает имя, размер исходника и список
+    (имя миниатюры, размер) для регистрации через ``register_thumbnails``.
+    """
+    backend = default.backend
+    source = image_file(name)
+    source_image = default.engine.get_image(source)
+    try:
+        image_info = default.engine.get_image_info(source_image)
+        built = []
+        for thumbnail in settings.POST_THUMBNAILS:
+            for _, _, geometry, options in thumbnail_variants(thumbnail):
+                options = thumbnail_options(source, options)
+                file = ImageFile(
+                    backend._get_thumbnail_filename(source, geometry, options),
+                    default.storage,
+                )
+                if force or not file.exists():
+                    options["image_info"] = image_info
+                    backend._create_thumbnail(
+                        source_image, geometry, options, file
+                    )
+                else:
+                    file.set_size()
+                built.append((file.name, file.size))
+        size = default.engine.get_image_size(source_image)
+    finally:
+        default.engine.cleanup(source_image)
+    return name, size, built
+
+
+def kvstore_get_many(raw_keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in raw_keys}
+    values = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                "key", "value"
+            )
+        )
+        kvstore.cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(stored)
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+def kvstore_set_many(values):
+    """Записывает сырые значения в KV-хранилище sorl одним пакетом."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        for key, value in values.items():
+            kvstore._set_raw(key, value)
+        return
+    with transaction.atomic():
+        KVStoreModel.objects.filter(key__in=list(values)).delete()
+        KVStoreModel.objects.bulk_create(
+            KVStoreModel(key=key, value=value) for key, value in values.items()
+        )
+    kvstore.cache.set_many(values, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def register_thumbnails(results):
+    """Регистрирует результаты ``build_thumbnails`` в KV-хранилище.
+
+    Списки миниатюр исходников дополняются, а не перезаписываются.
+    """
+    values = {}
+    thumbnail_lists = {}
+    for name, size, built in results:
+        source = image_file(name)
+        source.set_size(size)
+        values[add_prefix(source.key)] = serialize_image_file(source)
+        keys = thumbnail_lists.setdefault(
+            add_prefix(source.key, identity="thumbnails"), set()
+        )
+        for thumbnail_name, thumbnail_size in built:
+            thumbnail = ImageFile(thumbnail_name, default.storage)
+            thumbnail.set_size(thumbnail_size)
+            values[add_prefix(thumbnail.key)] = serialize_image_file(
+                thumbnail
+            )
+            keys.add(thumbnail.key)
+    for key, stored in kvstore_get_many(list(thumbnail_lists)).items():
+        thumbnail_lists[key].update(deserialize(stored))
+    values.update(
+        (key, serialize(sorted(keys)))
+        for key, keys in thumbnail_lists.items()
+    )
+    kvstore_set_many(values)
+
+
+def attach_thumbnails(posts, thumbnail="card"):
+    """Проставляет миниатюры всем постам страницы.
+
+    ``post.thumbnail`` — JPEG базового размера, ``post.thumbnail_srcset``
+    — его варианты по ширине, ``post.thumbnail_sources`` — варианты в
+    современных форматах для ``<picture>``. Все варианты ищутся в
+    KV-хранилище sorl одним ``get_many``. Недостающие варианты ставятся
+    в фоновую очередь, если она включена; синхронно строится только
+    базовый JPEG.
+    """
+    base_geometry, base_options = settings.POST_THUMBNAILS[thumbnail]
+    variants = list(thumbnail_variants(thumbnail))
+    posts = list(posts)
+    raw_keys = {
+        (post.pk, geometry, image_format): add_prefix(
+            thumbnail_file(post.image.name, geometry, options).key
+        )
+        for post in posts
+        if post.image
+        for image_format, _, geometry, options in variants
+    }
+    found = kvstore_get_many(list(raw_keys.values()))
+    for post in posts:
+        post.thumbnail = None
+        post.thumbnail_srcset = ""
+        post.thumbnail_sources = []
+        if not post.image:
+            continue
+        srcsets = {}
+        complete = True
+        for image_format, width, geometry, _ in variants:
+            value = found.get(raw_keys[post.pk, geometry, image_format])
+            if not value:
+                complete = False
+                continue
+            variant = deserialize_image_file(value)
+            srcsets.setdefault(image_format, []).append(
+                f"{variant.url} {width}w"
+            )
+            if image_format == "JPEG" and geometry == base_geometry:
+                post.thumbnail = variant
+        if not complete and settings.POST_THUMBNAIL_WORKERS:
+            queue_thumbnails(post.image.name)
+        if post.thumbnail is None:
+            try:
+                post.thumbnail = get_thumbnail(
+                    post.image, base_geometry, **base_options
+                )
+            except Exception:
+                logger.exception(
+                    "Не удалось построить миниатюру для %s", post.image.name
+                )
+                continue
+        post.thumbnail_srcset = ", ".join(srcsets.pop("JPEG", ()))
+        post.thumbnail_sources = [
+            {"type": MIME_TYPES[image_format], "srcset": ", ".join(srcset)}
+            for image_format, srcset in srcsets.items()
+        ]
+    return posts
@@ -0,0 +1,136 @@
+"""Популярные посты и группы.
+
+У каждого поста и группы есть рейтинг, который вдвое затухает за
+``TRENDING_HALF_LIFE`` секунд. События (новый пост, комментарий,
+пачка просмотров) пачкой приводят рейтинги к текущему моменту и
+добавляют свой вес — на запрос это пара запросов. Периодическая
+задача ``refresh_trending`` удаляет угасшие строки и кладёт первые
+``TRENDING_TOP`` в кэш, так что страница популярного читает готовый
+список. Если кэш остыл, страница показывает прошлый список (он лежит
+в кэше без срока) или пустой и ставит пересчёт воркеру: полный проход
+по ``Trend`` в запросе не выполняется.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from tasks.registry import enqueue
+
+from .models import Post, Trend
+
+CACHE_KEY = "posts:trending:{kind}"
+STALE_CACHE_KEY = "posts:trending:{kind}:stale"
+REFRESH_QUEUED_KEY = "posts:trending:refresh-queued"
+REFRESH_QUEUED_TIMEOUT = 60
+BUMP_ATTEMPTS = 3
+
+
+def decay(score, since, now):
+    elapsed = (now - since).total_seconds()
+    return score * 0.5 ** (elapsed / settings.TRENDING_HALF_LIFE)
+
+
+def bump(weights, now=None):
+    """Добавляет веса ``{(kind, object_id): weight}`` к рейтингам."""
+    now = now or timezone.now()
+    for attempt in range(BUMP_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _bump(weights, now)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос: теперь она есть.
+            if attempt == BUMP_ATTEMPTS - 1:
+                raise
+
+
+def _bump(weights, now):
+    existing = {}
+    for kind in {kind for kind, _ in weights}:
+        ids = [object_id for key, object_id in weights if key == kind]
+        for trend in Trend.objects.select_for_update().filter(
+            kind=kind, object_id__in=ids
+        ):
+            existing[trend.kind, trend.object_id] = trend
+    created = []
+    for (kind, object_id), weight in weights.items():
+        trend = existing.get((kind, object_id))
+        if trend is None:
+            created.append(Trend(
+                kind=kind, object_id=object_id, score=weight, updated=now
+            ))
+        else:
+            trend.score = decay(trend.score, trend.updated, now) + weight
+            trend.updated = now
+    Trend.objects.bulk_update(existing.values(), ("score", "updated"))
+    Trend.objects.bulk_create(created)
+    return len(weights)
+
+
+def record(event, counts):
+    """Событие ``event`` для постов ``{post_id: число}``.
+
+    Вес события достаётся посту и его группе.
+    """
+    weight = settings.TRENDING_WEIGHTS[event]
+    weights = Counter()
+    for post_id, group_id in (
+        Post.objects.filter(pk__in=list(counts))
+        .order_by()
+        .values_list("pk", "group_id")
+    ):
+        weights[Trend.POST, post_id] += weight * counts[post_id]
+        if group_id is not None:
+            weights[Trend.GROUP, group_id] += weight * counts[post_id]
+    if weights:
+        bump(weights)
+
+
+def refresh(now=None):
+    """Удаляет угасшие рейтинги и пересчитывает списки популярного."""
+    now = now or timezone.now()
+    scores = {Trend.POST: [], Trend.GROUP: []}
+    faded = []
+    for pk, kind, object_id, score, updated in Trend.objects.values_list(
+        "pk", "kind", "object_id", "score", "updated"
+    ).iterator():
+        score = decay(score, updated, now)
+        if score < settings.TRENDING_MIN_SCORE:
+            faded.append(pk)
+        else:
+            scores[kind].append((score, object_id))
+    for start in range(0, len(faded), 500):
+        Trend.objects.filter(pk__in=faded[start:start + 500]).delete()
+    tops = {}
+    for kind, items in scores.items():
+        items.sort(reverse=True)
+        tops[kind] = [
+            object_id for _, object_id in items[:settings.TRENDING_TOP]
+        ]
+    cache.set_many(
+        {CACHE_KEY.format(kind=kind): top for kind, top in tops.items()},
+        settings.TRENDING_CACHE_TIMEOUT,
+    )
+    cache.set_many(
+        {STALE_CACHE_KEY.format(kind=kind): top for kind, top in tops.items()},
+        None,
+    )
+    return tops
+
+
+def top(kind):
+    """Id самых популярных объектов ``kind``, лучшие первыми."""
+    ids = cache.get(CACHE_KEY.format(kind=kind))
+    if ids is None:
+        # Пересчёт ставит первый промах, остальные только читают кэш;
+        # run_at уводит пересчёт к воркеру и при TASKS_EAGER.
+        if cache.add(REFRESH_QUEUED_KEY, True, REFRESH_QUEUED_TIMEOUT):
+            enqueue(
+                "posts.tasks.refresh_trending",
+                run_at=timezone.now(),
+                unique_key="trending:refresh",
+            )
+        ids = cache.get(STALE_CACHE_KEY.format(kind=kind), [])
+    return ids
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = "posts"
 
@@ -15,8 +15,15 @@ urlpatterns = [
     path(
         "posts/<int:post_id>/comment/", views.add_comment, name="add_comment"
     ),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
     path("posts/<int:post_id>/delete/", views.post_delete, name="post_delete"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("events/", views.post_events, name="post_events"),
+    path("trending/", views.trending, name="trending"),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
@@ -27,4 +34,41 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow",
     ),
+    path(
+        "profile/<str:username>/export/",
+        views.profile_export,
+        name="profile_export",
+    ),
+    path("feed/rss/", feeds.IndexFeed(), name="index_rss"),
+    path("feed/atom/", feeds.IndexAtomFeed(), name="index_atom"),
+    path(
+        "group/<slug:slug>/feed/rss/", feeds.GroupFeed(), name="group_rss"
+    ),
+    path(
+        "group/<slug:slug>/feed/atom/",
+        feeds.GroupAtomFeed(),
+        name="group_atom",
+    ),
+    path(
+        "profile/<str:username>/feed/rss/",
+        feeds.AuthorFeed(),
+        name="profile_rss",
+    ),
+    path(
+        "profile/<str:username>/feed/atom/",
+        feeds.AuthorAtomFeed(),
+        name="profile_atom",
+    ),
+    path("api/posts/", api.index, name="api_index"),
+    path("api/group/<slug:slug>/", api.group_posts, name="api_group_posts"),
+    path("api/profile/<str:username>/", api.profile, name="api_profile"),
+    path("api/follow/", api.follow_posts, name="api_follow_posts"),
+    path(
+        "api/posts/<int:post_id>/", api.post_detail, name="api_post_detail"
+    ),
+    path(
+        "api/posts/<int:post_id>/comments/",
+        api.post_comments,
+        name="api_post_comments",
+    ),
 ]
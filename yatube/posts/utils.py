@@ -1,7 +1,54 @@
+from datetime import datetime, timedelta
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Comment
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 def get_paginator(queryset, items_count, request):
     paginator = Paginator(queryset, items_count)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def cursor_for(moment, pk):
+    microseconds = (moment - EPOCH) // timedelta(microseconds=1)
+    return f"{microseconds}-{pk}"
+
+
+def encode_cursor(comment):
+    return cursor_for(comment.created, comment.pk)
+
+
+def decode_cursor(cursor):
+    """``(created, pk)`` из курсора; ``ValueError``, если он испорчен."""
+    microseconds, pk = cursor.split("-")
+    return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+
+
+def get_comment_page(post_id, cursor, items_count):
+    """Страница комментариев после ``cursor`` и курсор следующей.
+
+    Ключевая пагинация по индексу (post, created): страница читается
+    одинаково быстро при любом числе комментариев, без OFFSET и COUNT.
+    """
+    comments = (
+        Comment.objects.filter(post_id=post_id)
+        .select_related("author")
+        .order_by("created", "pk")
+    )
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        comments = comments.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        )
+    comments = list(comments[:items_count + 1])
+    next_cursor = None
+    if len(comments) > items_count:
+        comments = comments[:items_count]
+        next_cursor = encode_cursor(comments[-1])
+    return comments, next_cursor
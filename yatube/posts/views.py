@@ -1,23 +1,41 @@
 from django.contrib.auth.decorators import login_required
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
+from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 
+from core.ratelimit import rate_limit
+
+from .counters import view_count, view_counter
+from .events import latest_post_id, stream_events
+from .exports import EXPORT_FORMATS, export_author
+from .follow_index import follow_graph
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_paginator
+from .models import Follow, Group, Post, Trend, User
+from .recommendations import follow_suggestions
+from .thumbnails import attach_thumbnails
+from .trending import top
+from .utils import get_comment_page, get_paginator
 
 
 POSTS_COUNT = 10
+COMMENTS_COUNT = 20
 
 
 @cache_page(20, key_prefix="index_page")
 @vary_on_cookie
 def index(request):
     post_list = Post.objects.all()
+    page_obj = get_paginator(post_list, POSTS_COUNT, request)
+    attach_thumbnails(page_obj)
     context = {
-        "page_obj": get_paginator(post_list, POSTS_COUNT, request),
+        "page_obj": page_obj,
     }
     return render(request, "posts/index.html", context)
 
@@ -25,9 +43,11 @@ def index(request):
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.all()
+    page_obj = get_paginator(post_list, POSTS_COUNT, request)
+    attach_thumbnails(page_obj)
     context = {
         "group": group,
-        "page_obj": get_paginator(post_list, POSTS_COUNT, request),
+        "page_obj": page_obj,
     }
     return render(request, "posts/group_list.html", context)
 
@@ -35,19 +55,46 @@ def group_posts(request, slug):
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     post_list = author.posts.all()
-    following = request.user.is_authenticated
-    if following:
-        following = author.following.filter(user=request.user).exists()
+    page_obj = get_paginator(post_list, POSTS_COUNT, request)
+    attach_thumbnails(page_obj)
+    index = follow_graph.get()
     context = {
         "author": author,
-        "page_obj": get_paginator(post_list, POSTS_COUNT, request),
-        "following": following,
+        "page_obj": page_obj,
+        "following": False,
+        "followers_count": index.followers_count(author.pk),
+        "following_count": index.following_count(author.pk),
     }
+    if request.user.is_authenticated:
+        user_id = request.user.pk
+        # Кнопку подписки решает база: индекс другого процесса может
+        # ещё не знать о только что сделанной подписке или отписке.
+        followers = set(
+            Follow.objects.filter(
+                Q(user_id=user_id, author_id=author.pk)
+                | Q(user_id=author.pk, author_id=user_id)
+            ).values_list("user_id", flat=True)
+        )
+        context["following"] = user_id in followers
+        context["follows_you"] = (
+            author.pk != user_id and author.pk in followers
+        )
+        if user_id != author.pk:
+            ids = index.followed_by_followees(user_id, author.pk)
+            context["followed_by"] = (
+                User.objects.filter(pk__in=ids).order_by("username")
+                if ids
+                else ()
+            )
+        context["suggestions"] = follow_suggestions(request.user)
     return render(request, "posts/profile.html", context)
 
 
 def post_detail(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
+    view_counter.increment(post.pk)
+    post.view_count = view_count(post)
+    attach_thumbnails([post])
     form = CommentForm(request.POST or None)
     author = post.author
     posts_count = author.posts.count()
@@ -56,12 +103,31 @@ def post_detail(request, post_id):
         "author": author,
         "posts_count": posts_count,
         "form": form,
-        "comments": post.comments.all(),
     }
+    context["comments"], context["next_cursor"] = get_comment_page(
+        post.pk, None, COMMENTS_COUNT
+    )
     return render(request, "posts/post_detail.html", context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only("pk"), pk=post_id)
+    try:
+        comments, next_cursor = get_comment_page(
+            post.pk, request.GET.get("after"), COMMENTS_COUNT
+        )
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest()
+    context = {
+        "post": post,
+        "comments": comments,
+        "next_cursor": next_cursor,
+    }
+    return render(request, "posts/includes/comments.html", context)
+
+
 @login_required
+@rate_limit("post_create")
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
 
@@ -79,7 +145,8 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    # Без views: save() не затрёт просмотры, записанные тем временем.
+    post = get_object_or_404(Post.objects.defer("views"), pk=post_id)
     if post.author != request.user:
         return redirect("posts:post_detail", post_id=post_id)
 
@@ -114,6 +181,7 @@ def post_delete(request, post_id):
 
 
 @login_required
+@rate_limit("add_comment")
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -128,13 +196,57 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     post_list = Post.objects.filter(author__following__user=request.user)
+    page_obj = get_paginator(post_list, POSTS_COUNT, request)
+    attach_thumbnails(page_obj)
     context = {
-        "page_obj": get_paginator(post_list, POSTS_COUNT, request),
+        "page_obj": page_obj,
+        "suggestions": follow_suggestions(request.user),
     }
     return render(request, "posts/follow.html", context)
 
 
+def trending(request):
+    post_ids = top(Trend.POST)
+    posts = Post.objects.select_related("author", "group").in_bulk(post_ids)
+    posts = [posts[pk] for pk in post_ids if pk in posts]
+    attach_thumbnails(posts)
+    group_ids = top(Trend.GROUP)
+    groups = Group.objects.in_bulk(group_ids)
+    context = {
+        "posts": posts,
+        "groups": [groups[pk] for pk in group_ids if pk in groups],
+    }
+    return render(request, "posts/trending.html", context)
+
+
+def post_events(request):
+    feed = request.GET.get("feed", "all")
+    author_ids = None
+    if feed == "follow":
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden()
+        author_ids = set(
+            Follow.objects.filter(user=request.user).values_list(
+                "author_id", flat=True
+            )
+        )
+    elif feed != "all":
+        return HttpResponseBadRequest()
+    after = request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("after")
+    try:
+        after = int(after)
+    except (TypeError, ValueError):
+        after = latest_post_id() or 0
+    response = StreamingHttpResponse(
+        stream_events(after, author_ids), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
+@rate_limit("profile_follow")
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if not (
@@ -153,3 +265,21 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     request.user.follower.filter(author=author).delete()
     return redirect("posts:profile", username=username)
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        return redirect("posts:profile", username=username)
+    export_format = request.GET.get("format", "jsonl")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Неизвестный формат выгрузки")
+    response = StreamingHttpResponse(
+        export_author(author, export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{author.username}.{export_format}"'
+    )
+    return response
@@ -0,0 +1,23 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        "pk",
+        "name",
+        "status",
+        "attempts",
+        "run_at",
+        "wait_ms",
+        "duration_ms",
+        "locked_by",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("name", "unique_key")
+    readonly_fields = ("created", "started_at", "finished_at", "last_error")
+    empty_value_display = "-пусто-"
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,44 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает воркер фоновых задач. Воркеров можно запускать "
+        "несколько: каждая задача достаётся ровно одному."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name", help="Имя воркера, по умолчанию host:pid."
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            help="Пауза между опросами пустой очереди, в секундах.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить готовые задачи и выйти.",
+        )
+
+    def handle(self, *args, **options):
+        if options["verbosity"] > 1:
+            logging.getLogger("yatube.tasks").setLevel(logging.INFO)
+        worker = Worker(options["name"])
+        if options["once"]:
+            worker.requeue_stale()
+            worker.schedule_periodic()
+            done = worker.run_once()
+            self.stdout.write(f"Выполнено задач: {done}")
+            return
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f"Воркер {worker.name} запущен")
+        worker.run(options["sleep"])
+        self.stdout.write(f"Воркер {worker.name} остановлен")
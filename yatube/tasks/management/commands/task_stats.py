@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Q
+
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Показывает число и время выполнения задач по каждому имени."
+
+    def handle(self, *args, **options):
+        rows = (
+            Task.objects.values("name")
+            .annotate(
+                total=Count("pk"),
+                queued=Count("pk", filter=Q(status=Task.QUEUED)),
+                failed=Count("pk", filter=Q(status=Task.FAILED)),
+                avg_ms=Avg("duration_ms"),
+                max_ms=Max("duration_ms"),
+                wait_ms=Avg("wait_ms"),
+            )
+            .order_by("-total")
+        )
+        for row in rows:
+            self.stdout.write(
+                "{name}: всего {total}, в очереди {queued}, "
+                "провалено {failed}, среднее {avg:.1f} мс, "
+                "максимум {max:.1f} мс, ожидание {wait:.1f} мс".format(
+                    avg=row["avg_ms"] or 0,
+                    max=row["max_ms"] or 0,
+                    wait=row["wait_ms"] or 0,
+                    **row,
+                )
+            )
@@ -0,0 +1,64 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Провалена"),
+    )
+
+    name = models.CharField("Задача", max_length=200)
+    args = models.TextField("Аргументы", default="[]")
+    kwargs = models.TextField("Именованные аргументы", default="{}")
+    status = models.CharField(
+        "Статус", max_length=10, choices=STATUSES, default=QUEUED
+    )
+    run_at = models.DateTimeField("Запустить после", default=timezone.now)
+    unique_key = models.CharField(
+        "Ключ уникальности",
+        max_length=255,
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="Пока задача не завершена, второй такой же не будет.",
+    )
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveIntegerField("Максимум попыток", default=5)
+    locked_by = models.CharField("Воркер", max_length=100, blank=True)
+    locked_at = models.DateTimeField("Захвачена", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created = models.DateTimeField("Создана", auto_now_add=True)
+    started_at = models.DateTimeField("Начата", null=True, blank=True)
+    finished_at = models.DateTimeField("Завершена", null=True, blank=True)
+    wait_ms = models.FloatField("Ожидание, мс", null=True, blank=True)
+    duration_ms = models.FloatField("Выполнение, мс", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+        ordering = ("run_at", "pk")
+        indexes = (models.Index(fields=("status", "run_at")),)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @staticmethod
+    def dump(value):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+
+    @staticmethod
+    def load(value):
+        return json.loads(value)
+
+    def load_args(self):
+        return json.loads(self.args), json.loads(self.kwargs)
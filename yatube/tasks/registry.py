@@ -0,0 +1,119 @@
+"""Объявление и постановка фоновых задач.
+
+Задача — обычная функция из модуля ``tasks.py`` приложения::
+
+    @task(max_attempts=3)
+    def build_post_thumbnails(name, size=None):
+        ...
+
+    build_post_thumbnails.delay("posts/ab/cd/….jpg", size=(800, 600))
+
+Строка задачи пишется в той же транзакции, что и данные запроса, так
+что воркер увидит её только после коммита. Если ``TASKS_EAGER``
+включён, срочные задачи выполняются прямо в процессе после коммита —
+так проект работает без запущенного ``run_worker``.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger("yatube.tasks")
+
+REGISTRY = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts, every):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.every = every
+        self.__doc__ = func.__doc__
+        self.__wrapped__ = func
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<task {self.name}>"
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self, args, kwargs)
+
+    @property
+    def periodic_key(self):
+        return f"periodic:{self.name}"
+
+
+def task(func=None, *, name=None, max_attempts=None, every=None):
+    """Регистрирует функцию как задачу.
+
+    ``every`` — интервал (``timedelta``) для периодической задачи:
+    воркер сам держит в очереди ровно одну её строку.
+    """
+
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        if task_name in REGISTRY:
+            raise ValueError(f"Задача {task_name} уже объявлена")
+        REGISTRY[task_name] = TaskFunction(
+            func,
+            task_name,
+            max_attempts or settings.TASKS_MAX_ATTEMPTS,
+            every,
+        )
+        return REGISTRY[task_name]
+
+    if func is not None:
+        return register(func)
+    return register
+
+
+def enqueue(
+    task, args=(), kwargs=None, run_at=None, countdown=None, unique_key=None
+):
+    """Ставит задачу в очередь и возвращает её строку.
+
+    ``countdown`` — задержка в секундах, ``run_at`` — точное время.
+    Если задача с таким ``unique_key`` ещё не завершена, возвращается
+    она, а новая не создаётся.
+    """
+    if isinstance(task, str):
+        task = REGISTRY[task]
+    kwargs = kwargs or {}
+    if countdown is not None:
+        run_at = timezone.now() + timedelta(seconds=countdown)
+    if run_at is None and settings.TASKS_EAGER:
+        transaction.on_commit(lambda: run_eager(task, args, kwargs))
+        return None
+    fields = {
+        "name": task.name,
+        "args": Task.dump(list(args)),
+        "kwargs": Task.dump(kwargs),
+        "run_at": run_at or timezone.now(),
+        "max_attempts": task.max_attempts,
+    }
+    if unique_key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(unique_key=unique_key, **fields)
+    except IntegrityError:
+        return Task.objects.filter(unique_key=unique_key).first()
+
+
+def run_eager(task, args, kwargs):
+    started = time.monotonic()
+    try:
+        task(*args, **kwargs)
+    except Exception:
+        logger.exception("Задача %s завершилась ошибкой", task.name)
+    logger.info(
+        "%s: %.1f мс", task.name, (time.monotonic() - started) * 1000
+    )
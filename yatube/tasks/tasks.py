@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Task
+from .registry import task
+
+
+@task(every=timedelta(hours=1))
+def purge_finished_tasks():
+    """Удаляет выполненные задачи старше TASKS_KEEP_FINISHED."""
+    deadline = timezone.now() - settings.TASKS_KEEP_FINISHED
+    Task.objects.filter(status=Task.DONE, finished_at__lt=deadline).delete()
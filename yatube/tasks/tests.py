@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .registry import REGISTRY, enqueue, task
+from .worker import Worker, backoff
+
+CALLS = []
+# Воркер выполняет и периодические задачи проекта, в том числе карту
+# сайта: её файлы пишутся во временный MEDIA_ROOT.
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@task(name="tests.record", max_attempts=2)
+def record(value, scale=1):
+    CALLS.append(value * scale)
+
+
+@task(name="tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@task(name="tests.tick", every=timedelta(minutes=5))
+def tick():
+    CALLS.append("tick")
+
+
+@override_settings(TASKS_EAGER=False, MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WorkerTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        CALLS.clear()
+        self.worker = Worker("test-worker")
+
+    def test_queued_task_runs_once_with_metrics(self):
+        row = record.delay(3, scale=2)
+        self.assertEqual(row.status, Task.QUEUED)
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(CALLS, [6])
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.DONE)
+        self.assertEqual(row.attempts, 1)
+        self.assertIsNotNone(row.duration_ms)
+        self.assertGreaterEqual(row.wait_ms, 0)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_claim_is_exclusive(self):
+        record.delay(1)
+        other = Worker("other-worker")
+        claimed = self.worker.claim()
+        self.assertEqual(claimed.locked_by, "test-worker")
+        self.assertIsNone(other.claim())
+
+    def test_unique_key_deduplicates_pending_tasks(self):
+        first = enqueue(record, (1,), unique_key="record:1")
+        second = enqueue(record, (1,), unique_key="record:1")
+        self.assertEqual(first.pk, second.pk)
+        self.worker.run_once()
+        third = enqueue(record, (1,), unique_key="record:1")
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_scheduled_task_waits_for_its_time(self):
+        row = enqueue(record, (1,), countdown=60)
+        self.assertEqual(self.worker.run_once(), 0)
+        Task.objects.filter(pk=row.pk).update(run_at=timezone.now())
+        self.assertEqual(self.worker.run_once(), 1)
+
+    def test_failed_task_is_retried_with_backoff(self):
+        row = fail.delay()
+        before = timezone.now()
+        self.worker.run_once()
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.QUEUED)
+        self.assertIn("RuntimeError: boom", row.last_error)
+        self.assertGreaterEqual(
+            row.run_at, before + timedelta(seconds=backoff(1) / 1.1)
+        )
+        Task.objects.filter(pk=row.pk).update(run_at=timezone.now())
+        self.worker.run_once()
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.FAILED)
+        self.assertEqual(row.attempts, 2)
+
+    def test_backoff_grows_up_to_limit(self):
+        with override_settings(
+            TASKS_RETRY_BACKOFF=10, TASKS_RETRY_BACKOFF_MAX=100
+        ):
+            self.assertLess(backoff(1), 11.01)
+            self.assertGreaterEqual(backoff(3), 40)
+            self.assertLessEqual(backoff(10), 110)
+
+    def test_stale_task_is_requeued(self):
+        record.delay(1)
+        claimed = self.worker.claim()
+        Task.objects.filter(pk=claimed.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        self.assertEqual(Worker("other-worker").run_once(), 1)
+        # Результат отобранной задачи первый воркер уже не запишет.
+        self.worker.finish(claimed, "", 1.0)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.locked_by, "")
+        self.assertEqual(claimed.status, Task.DONE)
+
+    def test_periodic_task_keeps_one_pending_row(self):
+        self.worker.schedule_periodic()
+        self.worker.schedule_periodic()
+        rows = Task.objects.filter(name="tests.tick")
+        self.assertEqual(rows.count(), 1)
+        self.worker.run_once()
+        self.assertEqual(CALLS, ["tick"])
+        pending = rows.get(status=Task.QUEUED)
+        self.assertGreater(
+            pending.run_at, timezone.now() + timedelta(minutes=4)
+        )
+
+    def test_unknown_task_fails(self):
+        Task.objects.create(name="tests.missing", max_attempts=1)
+        self.worker.run_once()
+        row = Task.objects.get(name="tests.missing")
+        self.assertEqual(row.status, Task.FAILED)
+        self.assertIn("LookupError", row.last_error)
+
+    def test_commands(self):
+        record.delay(1)
+        out = StringIO()
+        call_command("run_worker", once=True, stdout=out)
+        self.assertIn("Выполнено задач:", out.getvalue())
+        out = StringIO()
+        call_command("task_stats", stdout=out)
+        self.assertIn("tests.record: всего 1", out.getvalue())
+
+    def test_project_tasks_are_discovered(self):
+        self.assertIn("posts.tasks.build_post_thumbnails", REGISTRY)
+        self.assertIn("tasks.tasks.purge_finished_tasks", REGISTRY)
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_eager_task_runs_after_commit(self):
+        with transaction.atomic():
+            self.assertIsNone(record.delay(2))
+            self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, [2])
+        try:
+            with transaction.atomic():
+                record.delay(3)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(CALLS, [2])
+        self.assertFalse(Task.objects.exists())
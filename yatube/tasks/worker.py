@@ -0,0 +1,169 @@
+"""Воркер очереди задач в базе данных.
+
+Задачу захватывает атомарный ``UPDATE … WHERE status = 'queued'``:
+из нескольких воркеров строку получит ровно один, и это работает и на
+SQLite, где нет ``SELECT … FOR UPDATE SKIP LOCKED``. Упавшая задача
+возвращается в очередь с экспоненциальной задержкой, а задачи
+воркера, который умер посреди работы, снова становятся доступны
+через ``TASKS_LOCK_TIMEOUT``.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .registry import REGISTRY, enqueue
+
+logger = logging.getLogger("yatube.tasks")
+
+CLAIM_BATCH = 10
+
+
+def backoff(attempts):
+    """Задержка перед попыткой ``attempts + 1``, в секундах."""
+    delay = min(
+        settings.TASKS_RETRY_BACKOFF * 2 ** max(attempts - 1, 0),
+        settings.TASKS_RETRY_BACKOFF_MAX,
+    )
+    return delay * random.uniform(1, 1.1)
+
+
+def ms_between(start, end):
+    return (end - start).total_seconds() * 1000
+
+
+class Worker:
+    def __init__(self, name=None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+
+    def schedule_periodic(self):
+        """Держит в очереди по одной строке каждой периодической задачи."""
+        for task in REGISTRY.values():
+            if task.every is not None:
+                enqueue(
+                    task, unique_key=task.periodic_key, run_at=timezone.now()
+                )
+
+    def requeue_stale(self):
+        deadline = timezone.now() - timedelta(
+            seconds=settings.TASKS_LOCK_TIMEOUT
+        )
+        count = Task.objects.filter(
+            status=Task.RUNNING, locked_at__lt=deadline
+        ).update(status=Task.QUEUED, locked_by="", locked_at=None)
+        if count:
+            logger.warning("Возвращено в очередь зависших задач: %s", count)
+        return count
+
+    def claim(self):
+        now = timezone.now()
+        candidates = (
+            Task.objects.filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by("run_at", "pk")
+            .values_list("pk", flat=True)[:CLAIM_BATCH]
+        )
+        for pk in candidates:
+            claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+                status=Task.RUNNING,
+                locked_by=self.name,
+                locked_at=now,
+                started_at=now,
+                attempts=F("attempts") + 1,
+            )
+            if claimed:
+                return Task.objects.get(pk=pk)
+        return None
+
+    def execute(self, task):
+        started = time.monotonic()
+        error = ""
+        try:
+            function = REGISTRY.get(task.name)
+            if function is None:
+                raise LookupError(f"Неизвестная задача {task.name}")
+            args, kwargs = task.load_args()
+            function(*args, **kwargs)
+        except Exception:
+            error = traceback.format_exc()
+        duration_ms = (time.monotonic() - started) * 1000
+        self.finish(task, error, duration_ms)
+        return not error
+
+    def finish(self, task, error, duration_ms):
+        now = timezone.now()
+        fields = {
+            "locked_by": "",
+            "locked_at": None,
+            "duration_ms": duration_ms,
+            "wait_ms": ms_between(task.run_at, task.started_at),
+            "last_error": error,
+        }
+        if not error:
+            fields.update(status=Task.DONE, finished_at=now, unique_key=None)
+        elif task.attempts < task.max_attempts:
+            fields.update(
+                status=Task.QUEUED,
+                run_at=now + timedelta(seconds=backoff(task.attempts)),
+            )
+        else:
+            fields.update(
+                status=Task.FAILED, finished_at=now, unique_key=None
+            )
+        # Если задачу уже отобрали как зависшую, её результат не пишем.
+        Task.objects.filter(pk=task.pk, locked_by=self.name).update(**fields)
+        log = logger.error if error else logger.info
+        log(
+            "%s #%s: %s, %.1f мс, ожидание %.1f мс%s",
+            task.name,
+            task.pk,
+            fields["status"],
+            duration_ms,
+            fields["wait_ms"],
+            f"\n{error}" if error else "",
+        )
+        function = REGISTRY.get(task.name)
+        if fields["status"] != Task.QUEUED and function and function.every:
+            enqueue(
+                function,
+                unique_key=function.periodic_key,
+                run_at=now + function.every,
+            )
+
+    def run_once(self):
+        """Выполняет все готовые задачи и возвращает их число."""
+        done = 0
+        while not self.stopping:
+            close_old_connections()
+            task = self.claim()
+            if task is None:
+                break
+            self.execute(task)
+            done += 1
+        return done
+
+    def run(self, poll_interval=None):
+        poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+        last_check = None
+        while not self.stopping:
+            if (
+                last_check is None
+                or time.monotonic() - last_check > settings.TASKS_LOCK_TIMEOUT
+            ):
+                self.requeue_stale()
+                self.schedule_periodic()
+                last_check = time.monotonic()
+            if not self.run_once() and not self.stopping:
+                time.sleep(poll_interval)
+
+    def stop(self, *args):
+        self.stopping = True
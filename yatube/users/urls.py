@@ -1,6 +1,8 @@
 import django.contrib.auth.views as auth_views
 from django.urls import path
 
+from core.ratelimit import rate_limit
+
 from . import views
 
 app_name = 'users'
@@ -14,13 +16,17 @@ urlpatterns = [
     ),
     path(
         'login/',
-        auth_views.LoginView.as_view(template_name='users/login.html'),
+        rate_limit('login')(
+            auth_views.LoginView.as_view(template_name='users/login.html')
+        ),
         name='login'
     ),
     path(
         'password_reset/',
-        auth_views.PasswordResetView.as_view(
-            template_name='users/password_reset_form.html'),
+        rate_limit('password_reset')(
+            auth_views.PasswordResetView.as_view(
+                template_name='users/password_reset_form.html')
+        ),
         name='password_reset_form'
     ),
     path(
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+from datetime import timedelta
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "core.apps.CoreConfig",
     "about.apps.AboutConfig",
+    "tasks.apps.TasksConfig",
     "sorl.thumbnail",
 ]
 
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.slow_queries.SlowQueryMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
@@ -130,15 +134,63 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
+STATIC_ROOT = os.path.join(BASE_DIR, "collected_static")
+# collectstatic хеширует имена и сжимает файлы в .gz/.br; фронтовой сервер
+# отдаёт STATIC_ROOT сам:
+#   location /static/ { alias <STATIC_ROOT>/; gzip_static on;
+#                       brotli_static on; expires max;
+#                       add_header Cache-Control immutable; }
+STATICFILES_STORAGE = "core.storage.CompressedManifestStaticFilesStorage"
+# Тесты идут без collectstatic, то есть без манифеста, а хранилище с
+# манифестом на отсутствующий файл падает: в тестах статика без хешей.
+TESTING = sys.argv[1:2] == ["test"] or "pytest" in sys.modules
+if TESTING:
+    STATICFILES_STORAGE = (
+        "django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Медиа отдаёт core.views.serve_media: Django проверяет доступ и заголовки,
+# а сами байты передаёт фронтовой сервер.
+#   "nginx"  — X-Accel-Redirect на MEDIA_ACCEL_PREFIX:
+#              location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+#   "apache" — X-Sendfile с абсолютным путём (mod_xsendfile).
+# Пустое значение — файл читает сам Python (только для разработки).
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_PUBLIC_PREFIXES = ("posts/", "cache/")
+MEDIA_MAX_AGE = 24 * 60 * 60
+
+# Карта сайта (posts.sitemaps): файлы в MEDIA_ROOT/SITEMAP_DIR, не больше
+# SITEMAP_SHARD_SIZE адресов в файле; SITE_URL — начало адресов в картах.
+SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000")
+SITEMAP_DIR = "sitemaps"
+SITEMAP_SHARD_SIZE = 50000
+SITEMAP_MAX_AGE = 60 * 60
+
+# Загрузки сразу пишутся во временные файлы, а не держатся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+# Ограничения на картинки постов, см. posts.images.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+# Сколько секунд после выдачи файла загрузке release_image его не удаляет.
+POST_IMAGE_RELEASE_GRACE = 60
+
 LOGIN_URL = "users:login"
 LOGIN_REDIRECT_URL = "posts:index"
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# Письма встают в очередь (core.mail), а отправляет их фоновая задача
+# пачками через EMAIL_DELIVERY_BACKEND.
+EMAIL_BACKEND = "core.mail.QueuedEmailBackend"
+EMAIL_DELIVERY_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_BATCH_SIZE = 100
+EMAIL_MAX_ATTEMPTS = 5
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
@@ -148,3 +200,114 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
+
+# Миниатюры картинок постов строятся сразу после сохранения поста.
+# "card" выводится в ленте и на странице поста.
+POST_THUMBNAILS = {
+    "card": ("960x339", {"crop": "center", "upscale": True}),
+}
+# Ширины адаптивных вариантов и форматы для <picture> в порядке
+# предпочтения; форматы, которые не умеет сохранять Pillow, пропускаются.
+POST_THUMBNAIL_WIDTHS = (480, 720, 960)
+POST_THUMBNAIL_FORMATS = ("AVIF", "WEBP")
+THUMBNAIL_BACKEND = "posts.thumbnails.ThumbnailBackend"
+# Число фоновых потоков, достраивающих недостающие миниатюры при показе
+# ленты. Миниатюры новых картинок строит задача из posts.tasks.
+POST_THUMBNAIL_WORKERS = int(os.environ.get("POST_THUMBNAIL_WORKERS", 0))
+
+# Живые обновления лент (posts.events): частота опроса базы, максимальная
+# длина соединения и задержка переподключения браузера.
+POST_EVENTS_POLL_INTERVAL = 10
+POST_EVENTS_MAX_DURATION = 5 * 60
+POST_EVENTS_RETRY_MS = 3000
+POST_EVENTS_BATCH = 20
+
+# Просмотры постов копятся в памяти процесса (posts.counters) и пишутся
+# в базу пачками не реже раза в интервал.
+VIEW_COUNTER_FLUSH_INTERVAL = 10
+VIEW_COUNTER_MAX_PENDING = 1000
+VIEW_COUNTER_BATCH = 500
+
+# Популярное (posts.trending): рейтинг вдвое затухает за период
+# полураспада; угасшие ниже TRENDING_MIN_SCORE строки удаляются.
+TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_WEIGHTS = {"post": 1.0, "comment": 3.0, "view": 0.1}
+TRENDING_MIN_SCORE = 0.05
+TRENDING_TOP = 10
+TRENDING_CACHE_TIMEOUT = 10 * 60
+
+# Индекс подписок в памяти процесса (posts.follow_index): сверка с
+# журналом событий в кеше, полная перезагрузка из базы и предел дельт.
+FOLLOW_INDEX_SYNC_INTERVAL = 1
+FOLLOW_INDEX_MAX_AGE = 60 * 60
+FOLLOW_INDEX_MAX_DELTA = 10000
+FOLLOW_INDEX_EVENT_TIMEOUT = 60 * 60
+
+# RSS/Atom (posts.feeds): число постов в фиде; кеш сбрасывается
+# событиями, таймаут лишь страхует от пропущенного сброса.
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_MAX_AGE = 60
+
+# JSON API лент (posts.api): длина страницы по умолчанию, предел ?limit=
+# и время, на которое клиентам и прокси можно кешировать ответ.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_MAX_AGE = 30
+
+# Лимиты частоты запросов (core.ratelimit): "число/период" на
+# пользователя ("user") или IP ("ip") для перечисленных методов.
+# За nginx IP клиента берётся из заголовка, который ставит прокси, иначе
+# все анонимы делят одно ведро адреса прокси:
+#   proxy_set_header X-Real-IP $remote_addr;  ->  HTTP_X_REAL_IP
+# Без прокси заголовок должен быть пустым: клиент подделает его сам.
+RATE_LIMIT_IP_HEADER = os.environ.get("RATE_LIMIT_IP_HEADER", "")
+RATE_LIMITS = {
+    "post_create": {"rate": "10/m", "key": "user", "methods": ("POST",)},
+    "add_comment": {"rate": "20/m", "key": "user", "methods": ("POST",)},
+    "profile_follow": {"rate": "30/m", "key": "user", "methods": ("GET",)},
+    "login": {"rate": "10/m", "key": "ip", "methods": ("POST",)},
+    "password_reset": {"rate": "5/h", "key": "ip", "methods": ("POST",)},
+}
+
+# Журнал медленных запросов, сводка: python manage.py slow_queries
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, "slow_queries.log")
+
+# Очередь фоновых задач в базе, воркер: python manage.py run_worker
+# Пока TASKS_EAGER включён, срочные задачи выполняются в самом процессе
+# после коммита; в продакшене его выключают и запускают воркеры.
+# Письма (core.mail) отправляет только воркер, даже при TASKS_EAGER.
+TASKS_EAGER = bool(int(os.environ.get("TASKS_EAGER", 1)))
+TASKS_POLL_INTERVAL = 1.0
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_BACKOFF = 10
+TASKS_RETRY_BACKOFF_MAX = 60 * 60
+TASKS_LOCK_TIMEOUT = 10 * 60
+TASKS_KEEP_FINISHED = timedelta(days=7)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "encoding": "utf-8",
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "yatube.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
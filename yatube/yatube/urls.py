@@ -15,10 +15,11 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls import handler404, handler403
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import serve_media, serve_sitemap
+
 handler403 = "core.views.csrf_failure"
 handler404 = "core.views.page_not_found"
 
@@ -28,9 +29,11 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
     path("about/", include("about.urls", namespace="about")),
+    path("sitemap.xml", serve_sitemap, name="sitemap"),
+    path("sitemaps/<str:name>", serve_sitemap, name="sitemap_shard"),
+    path(
+        settings.MEDIA_URL.lstrip("/") + "<path:path>",
+        serve_media,
+        name="media",
+    ),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )